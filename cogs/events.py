@@ -1,5 +1,5 @@
-import sqlite3
 from discord.ext import commands
+from lib.db import get_database
 from lib.embeds import *
 from lib.event import Event
 from lib.prefixes import get_prefix
@@ -56,9 +56,7 @@ class Events(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
-        with sqlite3.connect(self.db) as connection:
-            # TODO: Use a database to store events.
-            pass
+        self.database = get_database(self.db)  # TODO: Use the database to store events.
 
     @commands.command(aliases=['event', 'ev'])
     async def events(self, ctx, command: str = None, *args):
@@ -88,7 +86,7 @@ class Events(commands.Cog):
         message_id = int(split_link[-1])
         message = await ctx.bot.get_channel(channel_id).fetch_message(message_id)
         content = message.content
-        event_or_error_message = Event.from_json(ctx, content[content.index("{"):content.rindex("}") + 1])
+        event_or_error_message = await Event.from_json(ctx, content[content.index("{"):content.rindex("}") + 1])
 
         if isinstance(event_or_error_message, Event):
             event = event_or_error_message
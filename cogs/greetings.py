@@ -1,10 +1,14 @@
-from aiosqlite import connect
-from asyncio import Lock, TimeoutError, sleep
+from asyncio import Event, Lock, TimeoutError
 from discord.ext import commands
+from lib.db import get_database
+from lib.dm import queue_dm
 from lib.embeds import *
+from lib.metrics import record_timing, record_value, set_gauge
 from lib.prefixes import get_prefix
+from lib.scheduler import Scheduler
 from lib.utils import log
-from re import sub
+from re import escape, split, sub
+from time import monotonic
 
 KEY_PUBLIC_CHANNEL_ID = 'public_channel_id'
 KEY_PUBLIC_MESSAGE = 'public_message'
@@ -26,7 +30,11 @@ USER_STRING = '<user>'
 SERVER_STRING = '<server>'
 CLEAR_STRING = '<clear>'
 
-DELAY_SECONDS = 1  # How many seconds to wait after a user joins the server before sending the greeting message(s).
+# Splitting a greeting message on this pattern puts its literal text at even indices and its placeholders at odd ones.
+TEMPLATE_PLACEHOLDER_PATTERN = f'({escape(USER_STRING)}|{escape(SERVER_STRING)})'
+
+JOIN_WINDOW_SECONDS = 5  # How long to collect joins for before greeting them all at once. Must be at least 1 second.
+MAX_MENTIONS_PER_GREETING = 25  # The most new members that one public greeting message may mention.
 TIMEOUT_SECONDS = 180  # How many seconds to wait for a reaction/message before canceling the configuration session.
 
 BLANK_CONFIG = {
@@ -57,6 +65,11 @@ CONFIG_PROMPT_PRIVATE = '**What should I say in my private greeting DM to new me
 CONFIG_PROMPT_CHANNEL = '**Which channel should be used for public greetings in this server?**' \
                         '\n\n**Example:** \u200B {0}\n\nPlease tag your desired channel now.'  # arg: channel_mention
 
+METRIC_JOIN_WAVE_SIZE = 'greetings.join_wave_size'
+METRIC_GREETING_LATENCY = 'greetings.public_greeting_latency'
+METRIC_PENDING_JOINS = 'greetings.pending_joins'
+METRIC_PENDING_JOIN_WAVES = 'greetings.pending_join_waves'
+
 CONFIG_TIMEOUT_TEXT = 'You\'re too slow! \u200B \u200B 🦥 \u200B Canceled the config session and reverted any changes.'
 
 
@@ -91,21 +104,31 @@ class Greetings(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
-        self.cache = {}
-        self.cache_lock = Lock()
+        self.configs = {}  # Maps server IDs to their configs. Every config is loaded at startup and kept current.
+        self.templates = {}  # Maps server IDs to their compiled greeting messages, keyed like the config.
+        self.configs_loaded = Event()
+        self.config_lock = Lock()
+        self.pending_joins = {}  # Maps server IDs to the (member, join_time) pairs that are waiting to be greeted.
+        self.join_wave_scheduler = Scheduler(self.bot.loop)  # Schedules the greeting for each server's join wave.
+        self.database = get_database(self.db)
         self.bot.loop.create_task(self.initialize_database())
 
     async def initialize_database(self):
-        async with connect(self.db) as connection:
-            cursor = await connection.execute(
-                '''CREATE TABLE IF NOT EXISTS `greetings` (
-                    `server_id` INTEGER PRIMARY KEY UNIQUE,
-                    `public_channel_id` INTEGER,
-                    `public_message` TEXT NOT NULL,
-                    `private_message` TEXT NOT NULL
-                );''')
-            await connection.commit()
-            await cursor.close()
+        await self.database.execute(
+            '''CREATE TABLE IF NOT EXISTS `greetings` (
+                `server_id` INTEGER PRIMARY KEY UNIQUE,
+                `public_channel_id` INTEGER,
+                `public_message` TEXT NOT NULL,
+                `private_message` TEXT NOT NULL
+            );''')
+        for row in await self.database.fetchall('SELECT * FROM greetings'):
+            self.cache_config(row[0], {
+                KEY_PUBLIC_CHANNEL_ID: row[1],
+                KEY_PUBLIC_MESSAGE: row[2],
+                KEY_PRIVATE_MESSAGE: row[3]
+            })
+        self.configs_loaded.set()
+        log(f'Loaded greeting configurations for {len(self.configs)} server(s).')
 
     @commands.command(aliases=['greet', 'gt'])
     async def greetings(self, ctx, command: str = None, *args):
@@ -123,42 +146,88 @@ class Greetings(commands.Cog):
     @commands.Cog.listener()
     async def on_member_join(self, member):
         server = member.guild
-        config = await self.get_config_for_server(server)
         log(f'GREETINGS: {member.name}#{member.discriminator} joined server "{server.name}".')
-        await sleep(DELAY_SECONDS)  # Without this, the message might be sent before the user gets access to the server.
+        # Members who join around the same time are greeted together, so that a wave of joins doesn't flood the channel.
+        # The delay also makes sure that the new members have access to the server by the time they're greeted.
+        if server.id not in self.pending_joins:
+            self.pending_joins[server.id] = []
+            self.join_wave_scheduler.schedule(server.id, JOIN_WINDOW_SECONDS, self.greet_join_wave, server)
+        self.pending_joins[server.id].append((member, monotonic()))
+        self.update_pending_join_gauges()
+
+    # Requires intents.members in order to work.
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        # Members who leave again before they've been greeted are taken out of their join wave.
+        joins = self.pending_joins.get(member.guild.id)
+        if joins:
+            joins[:] = [(joined_member, join_time) for joined_member, join_time in joins
+                        if joined_member.id != member.id]
+            if not joins:
+                self.join_wave_scheduler.cancel(member.guild.id)
+                del self.pending_joins[member.guild.id]
+            self.update_pending_join_gauges()
+
+    def update_pending_join_gauges(self):
+        set_gauge(METRIC_PENDING_JOINS, sum(len(joins) for joins in self.pending_joins.values()))
+        set_gauge(METRIC_PENDING_JOIN_WAVES, len(self.join_wave_scheduler))
+
+    async def greet_join_wave(self, server):
+        joins = self.pending_joins.pop(server.id, [])
+        members = [member for member, join_time in joins]
+        self.update_pending_join_gauges()
+        if not members:
+            return
+
+        await self.configs_loaded.wait()
+        config = self.get_config_for_server(server)
+        templates = self.templates.get(server.id)
+        record_value(METRIC_JOIN_WAVE_SIZE, len(members))
+        member_names = ', '.join(f'{member.name}#{member.discriminator}' for member in members)
+        log(f'GREETINGS: Greeting {len(members)} new member(s) in server "{server.name}": {member_names}')
 
         if config[KEY_PUBLIC_MESSAGE] and config[KEY_PUBLIC_CHANNEL_ID]:
             channel = self.bot.get_channel(config[KEY_PUBLIC_CHANNEL_ID])
             bot_member = server.get_member(self.bot.user.id)
             if not channel:
                 log(f'ERROR: Channel ID {config[KEY_PUBLIC_CHANNEL_ID]} is invalid. '
-                    f'Could not post public greeting for {member.name}#{member.discriminator}.', indent=1)
+                    f'Could not post public greeting.', indent=1)
             elif not channel.permissions_for(bot_member).send_messages:
                 log(f'ERROR: Missing permission to send messages in channel "{channel.name}". '
-                    f'Could not post public greeting for {member.name}#{member.discriminator}.', indent=1)
+                    f'Could not post public greeting.', indent=1)
             else:
-                message = Greetings.format_greeting_message(config[KEY_PUBLIC_MESSAGE], member, server)
-                log(f'Posting public greeting for {member.name}#{member.discriminator} in "{channel.name}".', indent=1)
-                await channel.send(message)
+                log(f'Posting public greeting in "{channel.name}".', indent=1)
+                template = templates[KEY_PUBLIC_MESSAGE]
+                if USER_STRING in template[1::2]:
+                    # Only split the wave into several greetings if the greeting mentions the new members.
+                    for i in range(0, len(members), MAX_MENTIONS_PER_GREETING):
+                        batch = members[i:i + MAX_MENTIONS_PER_GREETING]
+                        await channel.send(Greetings.format_greeting_message(template, batch, server))
+                else:
+                    await channel.send(Greetings.format_greeting_message(template, members, server))
+                now = monotonic()
+                for member, join_time in joins:
+                    record_timing(METRIC_GREETING_LATENCY, now - join_time)
         else:
             log(f'Public greetings are currently disabled for "{server.name}".', indent=1)
 
         if config[KEY_PRIVATE_MESSAGE]:
-            message = Greetings.format_greeting_message(config[KEY_PRIVATE_MESSAGE], member, server)
-            log(f'Sending private greeting to {member.name}#{member.discriminator}.', indent=1)
-            await member.send(message)
+            log('Queueing private greetings.', indent=1)
+            for member in members:
+                message = Greetings.format_greeting_message(templates[KEY_PRIVATE_MESSAGE], [member], server)
+                queue_dm(member, content=message)
         else:
             log(f'Private greetings are currently disabled for "{server.name}".', indent=1)
 
     async def config(self, ctx):
-        config = await self.get_config_for_server(ctx.guild)
+        config = self.get_config_for_server(ctx.guild)
         display_message = await ctx.send(embed=Greetings.get_display_embed(self.bot, ctx.guild, config))
         session_cog = Greetings.GTSession(self, ctx, config, display_message)
         self.bot.add_cog(session_cog)
         await session_cog.show_menu()
 
     async def demo(self, ctx):
-        config = await self.get_config_for_server(ctx.guild)
+        config = self.get_config_for_server(ctx.guild)
         greeting_sent = False
 
         if config[KEY_PUBLIC_MESSAGE] and config[KEY_PUBLIC_CHANNEL_ID]:
@@ -177,12 +246,14 @@ class Greetings(commands.Cog):
                     embed = create_basic_embed(f'The above message will be sent to {public_channel.mention} '
                                                f'(without this note, and with the correct user tagged if applicable) '
                                                f'when a new member joins this server.', EMOJI_SUCCESS)
-            message = Greetings.format_greeting_message(config[KEY_PUBLIC_MESSAGE], ctx.author, ctx.guild)
+            template = self.templates[ctx.guild.id][KEY_PUBLIC_MESSAGE]
+            message = Greetings.format_greeting_message(template, [ctx.author], ctx.guild)
             await ctx.send(message, embed=embed)
             greeting_sent = True
 
         if config[KEY_PRIVATE_MESSAGE]:
-            message = Greetings.format_greeting_message(config[KEY_PRIVATE_MESSAGE], ctx.author, ctx.guild)
+            template = self.templates[ctx.guild.id][KEY_PRIVATE_MESSAGE]
+            message = Greetings.format_greeting_message(template, [ctx.author], ctx.guild)
             await ctx.author.send(message)
             greeting_sent = True
 
@@ -197,60 +268,51 @@ class Greetings(commands.Cog):
             embed = create_basic_embed(TEXT_GREETING_NONE.format(ctx.guild.name), EMOJI_WARNING)
         await ctx.send(embed=embed)
 
-    # Always returns a valid (but maybe blank) config.
-    async def get_config_for_server(self, server):
-        async with self.cache_lock:
-            if server.id in self.cache:
-                return self.cache[server.id]
-            config = BLANK_CONFIG.copy()
-            async with connect(self.db) as connection:
-                async with connection.execute('SELECT * FROM greetings WHERE server_id=?', (server.id,)) as cursor:
-                    row = await cursor.fetchone()
-                    if row:
-                        config[KEY_PUBLIC_CHANNEL_ID] = row[1]
-                        config[KEY_PUBLIC_MESSAGE] = row[2]
-                        config[KEY_PRIVATE_MESSAGE] = row[3]
-            self.cache[server.id] = config
-            return config
+    # Always returns a valid (but maybe blank) config. This never reads the database, so it never has to wait.
+    def get_config_for_server(self, server):
+        return self.configs.get(server.id, BLANK_CONFIG)
+
+    # This method assumes that self.config_lock is already held by the caller (or that it's called during startup).
+    def cache_config(self, server_id, config):
+        self.configs[server_id] = config
+        self.templates[server_id] = {
+            KEY_PUBLIC_MESSAGE: Greetings.compile_greeting_template(config[KEY_PUBLIC_MESSAGE]),
+            KEY_PRIVATE_MESSAGE: Greetings.compile_greeting_template(config[KEY_PRIVATE_MESSAGE])
+        }
 
     async def save_config_for_server(self, server, config):
-        async with self.cache_lock:
-            self.cache[server.id] = config
-            async with connect(self.db) as connection:
-                async with connection.execute('SELECT * FROM greetings WHERE server_id=?', (server.id,)) as cursor:
-                    if await cursor.fetchone():
-                        await cursor.execute('UPDATE greetings '
-                                             'SET public_channel_id=?,'
-                                             '    public_message=?,'
-                                             '    private_message=? '
-                                             'WHERE server_id=?',
-                                             (config[KEY_PUBLIC_CHANNEL_ID],
-                                              config[KEY_PUBLIC_MESSAGE],
-                                              config[KEY_PRIVATE_MESSAGE],
-                                              server.id))
-                    else:
-                        await cursor.execute('INSERT INTO greetings VALUES (?, ?, ?, ?)',
-                                             (server.id,
-                                              config[KEY_PUBLIC_CHANNEL_ID],
-                                              config[KEY_PUBLIC_MESSAGE],
-                                              config[KEY_PRIVATE_MESSAGE]))
-                await connection.commit()
+        async with self.config_lock:
+            await self.database.execute('INSERT INTO greetings'
+                                        '    (server_id, public_channel_id, public_message, private_message) '
+                                        'VALUES (?, ?, ?, ?) '
+                                        'ON CONFLICT (server_id) '
+                                        'DO UPDATE SET public_channel_id=excluded.public_channel_id,'
+                                        '              public_message=excluded.public_message,'
+                                        '              private_message=excluded.private_message',
+                                        (server.id,
+                                         config[KEY_PUBLIC_CHANNEL_ID],
+                                         config[KEY_PUBLIC_MESSAGE],
+                                         config[KEY_PRIVATE_MESSAGE]))
+            self.cache_config(server.id, config)
 
     async def delete_config_for_server(self, server):
-        async with self.cache_lock:
-            self.cache.pop(server.id, None)
-            config_deleted = False
-            async with connect(self.db) as connection:
-                async with connection.execute('SELECT * FROM greetings WHERE server_id=?', (server.id,)) as cursor:
-                    if await cursor.fetchone():
-                        await cursor.execute('DELETE FROM greetings WHERE server_id=?', (server.id,))
-                        config_deleted = True
-                await connection.commit()
-            return config_deleted
+        async with self.config_lock:
+            deleted_rows = await self.database.execute('DELETE FROM greetings WHERE server_id=?', (server.id,))
+            self.configs.pop(server.id, None)
+            self.templates.pop(server.id, None)
+            return deleted_rows > 0
+
+    @staticmethod
+    def compile_greeting_template(greeting_message):
+        return tuple(split(TEMPLATE_PLACEHOLDER_PATTERN, greeting_message))
 
     @staticmethod
-    def format_greeting_message(greeting_message, user, server):
-        return greeting_message.replace(USER_STRING, user.mention).replace(SERVER_STRING, server.name)
+    def format_greeting_message(template, users, server):
+        user_mentions = [user.mention for user in users]
+        if len(user_mentions) > 1:
+            user_mentions = [', '.join(user_mentions[:-1]), user_mentions[-1]]
+        placeholder_values = {USER_STRING: ' and '.join(user_mentions), SERVER_STRING: server.name}
+        return ''.join(placeholder_values[segment] if i % 2 else segment for i, segment in enumerate(template))
 
     @staticmethod
     def get_display_embed(bot, server, config):
@@ -393,7 +455,7 @@ class Greetings(commands.Cog):
             await self.show_menu()
 
         async def save_config_changes(self):
-            existing_config = await self.parent.get_config_for_server(self.server)
+            existing_config = self.parent.get_config_for_server(self.server)
             if list(existing_config.values()) == list(self.config.values()):
                 embed = create_basic_embed('Config session ended. You didn\'t make any changes!', '🤨')
             else:
@@ -0,0 +1,24 @@
+from discord.ext.commands import Bot, Cog, Context, command
+from lib.embeds import *
+from lib.metrics import metrics
+from secrets import SUPER_USERS
+
+
+class Metrics(Cog):
+    # This cog intentionally has no "help" dict, so it isn't listed in the help menu.
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+
+    @command(aliases=['stats'])
+    async def metrics(self, ctx: Context):
+        if ctx.author.id not in SUPER_USERS:
+            await ctx.send(embed=create_error_embed('Sorry, you aren\'t authorized to use that command!'))
+            return
+
+        rows = [(f'`{name}`', str(value)) for name, value in sorted(metrics.items())]
+        await ctx.send(embed=create_table_embed('CirqueBot Metrics', ('Metric', 'Value'), rows, mark_rows=False))
+
+
+def setup(bot: Bot):
+    bot.add_cog(Metrics(bot))
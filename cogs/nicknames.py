@@ -1,5 +1,5 @@
-import sqlite3
 from discord.ext import commands
+from lib.db import get_database
 from lib.embeds import *
 from lib.prefixes import get_prefix
 
@@ -35,17 +35,17 @@ class Nicknames(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
-        with sqlite3.connect(self.db) as connection:
-            c = connection.cursor()
-            c.execute(
-                '''CREATE TABLE IF NOT EXISTS `nicknames` (
-                    `user_id` INTEGER,
-                    `server_id` INTEGER,
-                    `nickname` TEXT NOT NULL,
-                    PRIMARY KEY (`user_id`, `server_id`)
-                );''')
-            connection.commit()
-            c.close()
+        self.database = get_database(self.db)
+        self.bot.loop.create_task(self.initialize_database())
+
+    async def initialize_database(self):
+        await self.database.execute(
+            '''CREATE TABLE IF NOT EXISTS `nicknames` (
+                `user_id` INTEGER,
+                `server_id` INTEGER,
+                `nickname` TEXT NOT NULL,
+                PRIMARY KEY (`user_id`, `server_id`)
+            );''')
 
     @commands.command(aliases=['nickname', 'nn'])
     async def nicknames(self, ctx, command: str = None, *args):
@@ -64,18 +64,19 @@ class Nicknames(commands.Cog):
         member = Nicknames.get_member_from_guild(ctx, user_str)
         nickname = ' '.join(args[1:])
         if member:
-            with sqlite3.connect(self.db) as connection:
-                c = connection.cursor()
-                c.execute('SELECT * FROM nicknames WHERE user_id=? AND server_id=?', (member.id, ctx.guild.id))
-                if c.fetchone():
-                    c.execute(
+            async with self.database.transaction() as connection:
+                query = 'SELECT * FROM nicknames WHERE user_id=? AND server_id=?'
+                async with connection.execute(query, (member.id, ctx.guild.id)) as c:
+                    row = await c.fetchone()
+                if row:
+                    await connection.execute(
                         'UPDATE nicknames SET nickname=? WHERE user_id=? AND server_id=?',
                         (nickname, member.id, ctx.guild.id))
                     embed_msg = f'Updated nickname **{nickname}** for user **{member}**.'
                 else:
-                    c.execute('INSERT INTO nicknames VALUES (?, ?, ?)', (member.id, ctx.guild.id, nickname))
+                    await connection.execute(
+                        'INSERT INTO nicknames VALUES (?, ?, ?)', (member.id, ctx.guild.id, nickname))
                     embed_msg = f'Added nickname **{nickname}** for user **{member}**.'
-                c.close()
             await ctx.send(embed=create_basic_embed(embed_msg, EMOJI_SUCCESS))
         else:
             await Nicknames.on_member_not_found(ctx, user_str)
@@ -84,31 +85,28 @@ class Nicknames(commands.Cog):
         user_str = ' '.join(args)
         member = Nicknames.get_member_from_guild(ctx, user_str)
         if member:
-            with sqlite3.connect(self.db) as connection:
-                c = connection.cursor()
-                c.execute('SELECT * FROM nicknames WHERE user_id=? AND server_id=?', (member.id, ctx.guild.id))
-                row = c.fetchone()
+            async with self.database.transaction() as connection:
+                query = 'SELECT * FROM nicknames WHERE user_id=? AND server_id=?'
+                async with connection.execute(query, (member.id, ctx.guild.id)) as c:
+                    row = await c.fetchone()
                 if row:
-                    c.execute('DELETE FROM nicknames WHERE user_id=? AND server_id=?', (member.id, ctx.guild.id))
-                    embed_msg = f'Deleted nickname **{row[1]}** for user **{member}**.'
+                    await connection.execute(
+                        'DELETE FROM nicknames WHERE user_id=? AND server_id=?', (member.id, ctx.guild.id))
+                    embed_msg = f'Deleted nickname **{row[2]}** for user **{member}**.'
                     embed_emoji = EMOJI_SUCCESS
                 else:
                     embed_msg = f'User **{member}** does not currently have a nickname.'
                     embed_emoji = EMOJI_WARNING
-                c.close()
             await ctx.send(embed=create_basic_embed(embed_msg, embed_emoji))
         else:
             await Nicknames.on_member_not_found(ctx, user_str)
 
     async def list_nicknames(self, ctx):
         table_rows = []
-        with sqlite3.connect(self.db) as connection:
-            c = connection.cursor()
-            for row in c.execute('SELECT * FROM nicknames WHERE server_id=?', (ctx.guild.id,)):
-                member = ctx.guild.get_member(row[0])
-                if member:
-                    table_rows.append((row[2], str(member), member.display_name))
-            c.close()
+        for row in await self.database.fetchall('SELECT * FROM nicknames WHERE server_id=?', (ctx.guild.id,)):
+            member = ctx.guild.get_member(row[0])
+            if member:
+                table_rows.append((row[2], str(member), member.display_name))
         title = f'Nicknames in "{ctx.guild.name}"'
         headers = ('🤝 Nickname', '💬 Discord Handle', '🔍 Display Name')
         embed = create_table_embed(title, headers, table_rows)
@@ -127,17 +125,13 @@ class Nicknames(commands.Cog):
         else:
             return ctx.guild.get_member_named(identifier)
 
-    def get_member_from_db(self, ctx, sql, arg):
-        with sqlite3.connect(self.db) as connection:
-            c = connection.cursor()
-            c.execute(sql, (arg,))
-            results = c.fetchall()
-            c.close()
+    async def get_member_from_db(self, ctx, sql, parameters):
+        results = await self.database.fetchall(sql, parameters)
         if results and len(results) == 1:
             return Nicknames.get_member_from_guild(ctx, results[0][0])
 
-    def get_member_by_nickname(self, ctx, nickname):
-        return self.get_member_from_db(
+    async def get_member_by_nickname(self, ctx, nickname):
+        return await self.get_member_from_db(
             ctx, 'SELECT * FROM nicknames WHERE nickname=? AND server_id=?', (nickname, ctx.guild.id))
 
 
@@ -1,14 +1,29 @@
-from aiosqlite import connect
 from asyncio import Lock
+from bisect import bisect_left
 from dataclasses import dataclass, field
 from discord import Embed, Guild, TextChannel
-from discord.ext.commands import Bot, Cog, Context, command
+from discord.ext.commands import Bot, CheckFailure, Cog, CommandError, Context, check, group
 from json import dumps, loads
+from lib.db import get_database
 from lib.embeds import *
+from lib.metrics import increment_counter
 from lib.permission import Permission
 from lib.prefixes import get_prefix
 from lib.utils import log
+from re import findall, fullmatch
+from sys import stderr
+from time import monotonic
+from traceback import print_exception
+from types import MappingProxyType
 
+DENIAL_LOG_INTERVAL_SECONDS = 60  # How long to wait before logging the same denial (server, channel, permission) again.
+
+CHANNEL_MENTION_PATTERN = r'<#(\d+)>'
+CHANNEL_PATTERN = r'<#(\d+)>|(\d+)'  # Matches either a channel mention or a plain channel ID.
+
+METRIC_SUPPRESSED_DENIAL_LOGS = 'permissions.suppressed_denial_logs'
+
+EMOJI_PERMISSION_BULK = '🧰'
 EMOJI_PERMISSION_DETAILS = '🔍'
 EMOJI_PERMISSION_DISABLED = '⛔'
 EMOJI_PERMISSION_ENABLED = '✅'
@@ -21,6 +36,13 @@ ERROR_INVALID_PERMISSION_HINT_FORMAT = 'To see all available permissions, type:
 ERROR_UNSPECIFIED_PERMISSION_FORMAT = 'Please specify a permission for the \u200B `{0}` \u200B command.'  # arg: command
 ERROR_INVALID_CHANNEL_FORMAT = 'I don\'t have permission to send messages in {0}!'  # arg: channel_mention
 ERROR_UNSPECIFIED_CHANNEL = 'Please specify at least one channel for the \u200B `toggle` \u200B command.'
+ERROR_BULK_UNSPECIFIED_CHANGES = 'Please specify the changes to make, with each \u200B `enable`, `disable` or ' \
+                                 '`toggle` \u200B command on its own line.'
+ERROR_BULK_INVALID_LINE_FORMAT = '`{0}` \u200B is not a valid change. Each line must start with \u200B `enable`, ' \
+                                 '`disable` or `toggle`.'  # arg: line
+ERROR_BULK_INVALID_JSON = 'That isn\'t valid JSON. Please provide an object that maps each permission name to ' \
+                          '`true`, `false` or a list of channels.'
+ERROR_BULK_INVALID_JSON_VALUE_FORMAT = '`{0}` \u200B must be set to `true`, `false` or a list of channels.'  # arg: name
 
 OVERVIEW_TITLE_FORMAT = 'Permissions Overview for "{0}"'  # arg: server_name
 OVERVIEW_DISABLED_HEADER = f'{EMOJI_PERMISSION_DISABLED} \u200B Disabled'
@@ -53,6 +75,8 @@ UPDATE_DISABLED_FORMAT = 'The `{0}` permission is now disabled for all channels.
 UPDATE_ENABLED_FORMAT = 'The `{0}` permission is now enabled for all channels!'  # arg: permission_name
 UPDATE_RESTRICTED_FORMAT = 'The `{0}` permission is now enabled in these channels:' \
                            f'\n{TEXT_INDENT_SPACING * 3}'  # arg: permission_name
+UPDATE_BULK_HEADER_FORMAT = 'Updated **{0}** permission(s) in **"{1}"**:\n'  # args: update_count, server_name
+UPDATE_BULK_LINE_FORMAT = '\n{0} \u200B `{1}`'  # args: status_emoji, permission_name
 UPDATE_CORE_FUNCTION_FORMAT = '`{0}` \u200B is one of my core functions - I can\'t let you disable it!' \
                               f'\n{TEXT_INDENT_SPACING * 3}To restrict this permission to specific ' \
                               'channels, use the \u200B `toggle` \u200B command.'  # arg: permission_name
@@ -100,9 +124,98 @@ class PermissionConfig:
 PERMISSION_CONFIG_ENABLED = PermissionConfig(is_enabled=True)
 PERMISSION_CONFIG_DISABLED = PermissionConfig(is_enabled=False)
 
+
+@dataclass(frozen=True)
+class ServerPermissions:
+    """ A compact, immutable snapshot of the settings for every CirqueBot permission in a single server.
+
+    Instead of storing a PermissionConfig for each permission, the whole server is represented by two fields:
+        - "enabled_mask" is an integer in which bit N is set if the permission with ID N is enabled (in all channels or
+            only in whitelisted ones). Permissions that have never been configured simply keep their default bit.
+        - "whitelists" maps the ID of each RESTRICTED permission (and no others) to a sorted tuple of the IDs of the
+            channels in which it's enabled, so a whitelist can be searched with bisect instead of hashed.
+
+    Servers that still use the default settings all share the same DEFAULT_SERVER_PERMISSIONS object.
+    """
+
+    __slots__ = ('enabled_mask', 'whitelists')
+
+    enabled_mask: int
+    whitelists: MappingProxyType
+
+    def is_enabled(self, permission: Permission) -> bool:
+        return bool((self.enabled_mask >> permission.id) & 1)
+
+    def is_whitelisted(self, permission: Permission, channel_id: int) -> bool:
+        """ Returns whether the channel is whitelisted for the permission (always True if it isn't restricted). """
+        whitelist = self.whitelists.get(permission.id)
+        if not whitelist:
+            return True
+        index = bisect_left(whitelist, channel_id)
+        return (index < len(whitelist)) and (whitelist[index] == channel_id)
+
+    def get_config(self, permission: Permission) -> PermissionConfig:
+        if not self.is_enabled(permission):
+            return PERMISSION_CONFIG_DISABLED
+        return PermissionConfig.get_config(
+            is_enabled=True, whitelisted_channel_ids=frozenset(self.whitelists.get(permission.id, ())))
+
+    def with_config(self, permission: Permission, permission_config: PermissionConfig):
+        """ Returns a copy of this snapshot in which the given permission has the given config. """
+        permission_bit = 1 << permission.id
+        whitelists = {permission_id: whitelist for permission_id, whitelist in self.whitelists.items()
+                      if permission_id != permission.id}
+
+        if permission_config.is_enabled:
+            enabled_mask = self.enabled_mask | permission_bit
+            if permission_config.whitelisted_channel_ids:
+                whitelists[permission.id] = tuple(sorted(permission_config.whitelisted_channel_ids))
+        else:
+            enabled_mask = self.enabled_mask & ~permission_bit
+
+        return ServerPermissions.get_server_permissions(enabled_mask, whitelists)
+
+    @staticmethod
+    def get_server_permissions(enabled_mask: int, whitelists: dict):
+        if (enabled_mask == DEFAULT_ENABLED_MASK) and (not whitelists):
+            return DEFAULT_SERVER_PERMISSIONS
+        return ServerPermissions(enabled_mask, MappingProxyType(whitelists) if whitelists else NO_WHITELISTS)
+
+
+# Only the permissions related to core bot functionality are enabled by default.
+DEFAULT_ENABLED_MASK = sum(1 << permission.id for permission in Permission if permission.is_core_function)
+NO_WHITELISTS = MappingProxyType({})
+DEFAULT_SERVER_PERMISSIONS = ServerPermissions(DEFAULT_ENABLED_MASK, NO_WHITELISTS)
+
 # An immutable unordered set containing all recognized permission names, for fast validity checking.
 VALID_PERMISSION_NAMES = frozenset(permission.name for permission in Permission)
 
+# Maps each permission ID to its permission, for loading the permissions stored in the database.
+PERMISSIONS_BY_ID = MappingProxyType({permission.id: permission for permission in Permission})
+
+
+class PermissionDenied(CheckFailure):
+    def __init__(self, permission: Permission):
+        super().__init__(f'The {permission.name} permission is not granted here.')
+        self.permission = permission
+
+
+def require_permission(permission: Permission):
+    """ A decorator for commands that should only run in channels where the given permission is granted.
+
+    If the permission isn't granted, the user is told so and the command is skipped. For example:
+        @command()
+        @require_permission(Permission.ALLOW_BONKS)
+        async def bonk(self, ctx: Context):
+    """
+    async def predicate(ctx: Context) -> bool:
+        if not await Permissions.check(ctx.bot, permission, ctx.guild, ctx.channel):
+            await ctx.send(embed=create_error_embed(TEXT_MISSING_PERMISSION))
+            raise PermissionDenied(permission)
+        return True
+
+    return check(predicate)
+
 
 class Permissions(Cog):
     db = 'data/permissions.db'
@@ -141,30 +254,44 @@ class Permissions(Cog):
                 KEY_TITLE: 'toggle [permission name] [channel tag]',
                 KEY_DESCRIPTION: 'Toggles the inclusion of the specified channel in the whitelist for the permission.',
                 KEY_EXAMPLE: '!cb pm toggle CHANGE_GREETINGS #bot-commands'
+            },
+            {
+                KEY_EMOJI: EMOJI_PERMISSION_BULK,
+                KEY_TITLE: 'bulk [changes]',
+                KEY_DESCRIPTION: 'Makes several changes at once. Put each `enable`, `disable` or `toggle` command on '
+                                 'its own line (with any number of permissions), or paste a JSON object that maps '
+                                 'each permission name to `true`, `false` or a list of channels.',
+                KEY_EXAMPLE: '!cb pm bulk enable ALLOW_BONKS ALLOW_SPANKS'
             }
         ]
     }
 
     def __init__(self, bot: Bot):
         self.bot = bot
-        self.cache = {}
-        self.cache_lock = Lock()
+        self.cache = {}  # Maps each server ID to a ServerPermissions snapshot of its current permission settings.
+        self.cache_lock = Lock()  # Held while a snapshot is being loaded or replaced, but never while reading one.
+        self.versions = {}  # Maps each server ID to the number of times its snapshot has been replaced.
+        self.decisions = {}  # Maps each (server_id, channel_id, permission_id) to its (version, denial_text).
+        self.denial_log_times = {}  # Maps each (server_id, channel_id, permission_id) to when it can be logged again.
+        self.database = get_database(self.db)
         self.bot.loop.create_task(self.initialize_database())
 
     async def initialize_database(self):
-        async with connect(self.db) as connection:
-            cursor = await connection.execute(
-                '''CREATE TABLE IF NOT EXISTS `permissions` (
-                    `server_id` INTEGER,
-                    `permission_id` INTEGER,
-                    `is_enabled` BOOLEAN,
-                    `whitelisted_channel_ids` TEXT NOT NULL,
-                    PRIMARY KEY (`server_id`, `permission_id`)
-                );''')
-            await connection.commit()
-            await cursor.close()
-
-    @command(aliases=['permission', 'perms', 'perm', 'pm'])
+        await self.database.execute(
+            '''CREATE TABLE IF NOT EXISTS `permissions` (
+                `server_id` INTEGER,
+                `permission_id` INTEGER,
+                `is_enabled` BOOLEAN,
+                `whitelisted_channel_ids` TEXT NOT NULL,
+                PRIMARY KEY (`server_id`, `permission_id`)
+            );''')
+
+        await self.bot.wait_until_ready()
+        await self.load_all_server_permissions()
+
+    # This is a group only so that "bulk" can take its changes as raw text (see below). All other commands are handled
+    # by this callback, because invoke_without_command makes it run whenever no subcommand matches.
+    @group(aliases=['permission', 'perms', 'perm', 'pm'], invoke_without_command=True)
     async def permissions(self, ctx: Context, command: str = None, *args):
         prefix = get_prefix(self.bot, ctx.message)
 
@@ -225,6 +352,17 @@ class Permissions(Cog):
         else:
             await ctx.send(embed=create_error_embed(ERROR_UNSPECIFIED_CHANNEL))
 
+    @permissions.command()
+    async def bulk(self, ctx: Context, *, changes: str = ''):
+        # The changes are taken as the raw rest of the message, since they can span several lines and contain JSON,
+        # which the usual argument parsing would reject (e.g. because of its quotes).
+        if not await Permissions.check(self.bot, Permission.VIEW_PERMISSIONS, ctx.guild, ctx.channel) or \
+                not await Permissions.check(self.bot, Permission.CHANGE_PERMISSIONS, ctx.guild, ctx.channel):
+            await ctx.send(embed=create_error_embed(TEXT_MISSING_PERMISSION))
+            return
+
+        await self.bulk_update_permissions(ctx, changes)
+
     @staticmethod
     async def check(bot: Bot, permission: Permission, server: Guild, channel: TextChannel) -> bool:
         """ This gets called from other cogs to determine whether a permission is granted in the given server/channel.
@@ -233,21 +371,74 @@ class Permissions(Cog):
             log('ERROR: Permissions are only available in server channels. DMs are not recognized.')
             return False
 
-        permission_config = await bot.get_cog('Permissions').get_permission_config_for_server(server.id, permission)
+        return await bot.get_cog('Permissions').get_decision(permission, server, channel)
 
-        if not permission_config.is_enabled:
-            log(f'WARNING: Permission "{permission.name}" is disabled for all channels in "{server.name}".')
-            return False
+    async def get_decision(self, permission: Permission, server: Guild, channel: TextChannel) -> bool:
+        """ Returns whether the permission is granted in the channel, reusing the previous decision if possible.
+
+        Each decision is cached along with the version of the server's permission settings that it was based on, so
+        every decision in a server is invalidated at once (without having to find them) when its version is bumped.
+        """
+        decision_key = (server.id, channel.id, permission.id)
+        version = self.versions.get(server.id, 0)
+        decision = self.decisions.get(decision_key)
 
-        whitelisted_channel_ids = permission_config.whitelisted_channel_ids
-        if whitelisted_channel_ids and (channel.id not in whitelisted_channel_ids):
-            log(f'WARNING: "{channel.name}" is not whitelisted for {permission.name} in "{server.name}".')
-            log(f'Whitelisted channel IDs for {permission.name}: {list(whitelisted_channel_ids)}', indent=1)
+        if decision and (decision[0] == version):
+            denial_text = decision[1]
+        else:
+            server_permissions = await self.get_server_permissions(server.id)
+            denial_text = Permissions.get_denial_text(server_permissions, permission, server, channel)
+            self.decisions[decision_key] = (version, denial_text)
+            if decision and (decision[1] != denial_text):
+                self.denial_log_times.pop(decision_key, None)  # The reason has changed, so it's worth logging again.
+
+        if denial_text:
+            self.log_denial(decision_key, denial_text)
             return False
 
         # All checks have been passed - the permission is granted.
         return True
 
+    @staticmethod
+    def get_denial_text(server_permissions: ServerPermissions, permission: Permission, server: Guild,
+                        channel: TextChannel) -> str:
+        """ Returns the reason that the permission is denied in the channel, or None if the permission is granted. """
+        if not server_permissions.is_enabled(permission):
+            return f'WARNING: Permission "{permission.name}" is disabled for all channels in "{server.name}".'
+
+        if not server_permissions.is_whitelisted(permission, channel.id):
+            whitelisted_channel_ids = list(server_permissions.whitelists[permission.id])
+            return f'WARNING: "{channel.name}" is not whitelisted for {permission.name} in "{server.name}". ' \
+                   f'Whitelisted channel IDs: {whitelisted_channel_ids}'
+
+        return None
+
+    def log_denial(self, decision_key: tuple, denial_text: str):
+        # Each denial is only logged once per interval, so that a channel full of denied commands can't flood the log.
+        now = monotonic()
+        if now < self.denial_log_times.get(decision_key, 0):
+            increment_counter(METRIC_SUPPRESSED_DENIAL_LOGS)
+            return
+        self.denial_log_times[decision_key] = now + DENIAL_LOG_INTERVAL_SECONDS
+        log(denial_text)
+
+    def replace_server_permissions(self, server_id: int, server_permissions: ServerPermissions):
+        """ Swaps in a new snapshot of the server's permission settings. The cache lock must already be held. """
+        self.cache[server_id] = server_permissions
+        self.versions[server_id] = self.versions.get(server_id, 0) + 1
+
+    @Cog.listener()
+    async def on_command_error(self, ctx: Context, error: CommandError):
+        # require_permission can be used by any cog, so this has to listen to every command's errors.
+        if isinstance(error, PermissionDenied):
+            return  # The user has already been told, so there's nothing left to do.
+        if (ctx.command and ctx.command.has_error_handler()) or (ctx.cog and ctx.cog.has_error_handler()):
+            return  # The error has already been handled by the command or its cog.
+
+        # Adding this listener stops the bot from printing errors by default, so the other errors are printed here.
+        print(f'Ignoring exception in command {ctx.command}:', file=stderr)
+        print_exception(type(error), error, error.__traceback__, file=stderr)
+
     @staticmethod
     async def announce_permission_updates(ctx: Context, update_text: str, emoji: str):
         if update_text == UPDATE_WARNING_NO_CHANGES:
@@ -270,8 +461,9 @@ class Permissions(Cog):
             field_value = '\n'.join(permission_list) if permission_list else OVERVIEW_EMPTY_VALUE
             parent_embed.add_field(name=header, value=field_value)
 
+        server_permissions = await self.get_server_permissions(server.id)
         for permission in Permission:
-            permission_config = await self.get_permission_config_for_server(server.id, permission)
+            permission_config = server_permissions.get_config(permission)
             if not permission_config.is_enabled:
                 add_permission(permission, disabled_permissions)
             elif not permission_config.whitelisted_channel_ids:
@@ -381,73 +573,233 @@ class Permissions(Cog):
 
         await Permissions.announce_permission_updates(ctx, update_text, update_emoji)
 
+    async def bulk_update_permissions(self, ctx: Context, changes_text: str):
+        server_permissions = await self.get_server_permissions(ctx.guild.id)
+        (permission_configs, error_text) = self.parse_bulk_changes(ctx.guild, server_permissions, changes_text)
+        if error_text:
+            await ctx.send(embed=create_error_embed(error_text))
+            return
+
+        # Only save the permissions that actually change (in display order), so that the summary only lists those.
+        updated_permission_configs = {
+            permission: permission_configs[permission] for permission in Permission
+            if (permission in permission_configs) and
+               (permission_configs[permission] != server_permissions.get_config(permission))}
+
+        if updated_permission_configs:
+            await self.save_permission_configs_for_server(ctx.guild.id, updated_permission_configs)
+
+            update_text = UPDATE_BULK_HEADER_FORMAT.format(len(updated_permission_configs), ctx.guild.name)
+            for permission, permission_config in updated_permission_configs.items():
+                if not permission_config.is_enabled:
+                    update_text += UPDATE_BULK_LINE_FORMAT.format(EMOJI_PERMISSION_DISABLED, permission.name)
+                elif not permission_config.whitelisted_channel_ids:
+                    update_text += UPDATE_BULK_LINE_FORMAT.format(EMOJI_PERMISSION_ENABLED, permission.name)
+                else:
+                    update_text += UPDATE_BULK_LINE_FORMAT.format(EMOJI_PERMISSION_RESTRICTED, permission.name)
+                    update_text += ' \u200B ' + permission_config.get_channel_whitelist_display_text()
+        else:
+            update_text = UPDATE_WARNING_NO_CHANGES
+
+        await Permissions.announce_permission_updates(ctx, update_text, EMOJI_PERMISSION_BULK)
+
+    def parse_bulk_changes(self, server: Guild, server_permissions: ServerPermissions, changes_text: str) -> tuple:
+        """ Returns the new configs (keyed by permission) described by the changes text, and an error text (or None).
+
+        The changes are either lines that each start with "enable", "disable" or "toggle" (followed by the names of the
+        permissions to change, and for "toggle", the channels), or a JSON object (optionally in a code block) that maps
+        each permission name to true (enabled), false (disabled) or a list of channels (restricted to those channels).
+        """
+        changes_text = changes_text.strip().strip('`')
+        if changes_text.startswith('json'):
+            changes_text = changes_text[len('json'):]  # Remove the language of the code block.
+
+        if changes_text.lstrip().startswith('{'):
+            return self.parse_bulk_json(server, changes_text)
+
+        permission_configs = {}
+        for line in changes_text.splitlines():
+            words = [word for word in line.split() if '#' not in word]
+            if not words:
+                continue
+
+            action = words[0].lower()
+            if action not in ('enable', 'disable', 'toggle'):
+                return None, ERROR_BULK_INVALID_LINE_FORMAT.format(line.strip())
+            if len(words) == 1:
+                return None, ERROR_UNSPECIFIED_PERMISSION_FORMAT.format(action)
+
+            channel_ids = [int(channel_id) for channel_id in findall(CHANNEL_MENTION_PATTERN, line)]
+            if action == 'toggle':
+                error_text = self.get_channel_error_text(server, channel_ids)
+                if error_text:
+                    return None, error_text
+
+            for permission_name in words[1:]:
+                permission_name = permission_name.upper()
+                if permission_name not in VALID_PERMISSION_NAMES:
+                    return None, ERROR_INVALID_PERMISSION_TEXT_FORMAT.format(permission_name)
+                permission = Permission[permission_name]
+
+                if action == 'enable':
+                    permission_configs[permission] = PERMISSION_CONFIG_ENABLED
+                elif permission.is_core_function and (action == 'disable'):
+                    return None, UPDATE_CORE_FUNCTION_FORMAT.format(permission.name)
+                elif action == 'disable':
+                    permission_configs[permission] = PERMISSION_CONFIG_DISABLED
+                else:
+                    # Later lines build on earlier ones, so toggle the channels in whatever the permission has become.
+                    old_config = permission_configs.get(permission) or server_permissions.get_config(permission)
+                    new_channel_ids = old_config.whitelisted_channel_ids ^ frozenset(channel_ids)
+                    permission_configs[permission] = \
+                        PermissionConfig.get_config(is_enabled=True, whitelisted_channel_ids=new_channel_ids)
+
+        if not permission_configs:
+            return None, ERROR_BULK_UNSPECIFIED_CHANGES
+        return permission_configs, None
+
+    def parse_bulk_json(self, server: Guild, changes_text: str) -> tuple:
+        try:
+            settings = loads(changes_text)
+        except ValueError:
+            return None, ERROR_BULK_INVALID_JSON
+        if not isinstance(settings, dict):
+            return None, ERROR_BULK_INVALID_JSON
+
+        permission_configs = {}
+        for permission_name, setting in settings.items():
+            permission_name = permission_name.upper()
+            if permission_name not in VALID_PERMISSION_NAMES:
+                return None, ERROR_INVALID_PERMISSION_TEXT_FORMAT.format(permission_name)
+            permission = Permission[permission_name]
+
+            if setting is False and permission.is_core_function:
+                return None, UPDATE_CORE_FUNCTION_FORMAT.format(permission.name)
+            elif isinstance(setting, bool):
+                permission_configs[permission] = PERMISSION_CONFIG_ENABLED if setting else PERMISSION_CONFIG_DISABLED
+            elif isinstance(setting, list):
+                # Each channel can be given as its ID (either a number or a string) or as its mention (e.g. "<#1234>").
+                channel_ids = []
+                for channel in setting:
+                    match = fullmatch(CHANNEL_PATTERN, str(channel).strip())
+                    if not match:
+                        return None, ERROR_BULK_INVALID_JSON_VALUE_FORMAT.format(permission.name)
+                    channel_ids.append(int(match[1] or match[2]))
+
+                error_text = self.get_channel_error_text(server, channel_ids)
+                if error_text:
+                    return None, error_text
+                permission_configs[permission] = \
+                    PermissionConfig.get_config(is_enabled=True, whitelisted_channel_ids=frozenset(channel_ids))
+            else:
+                return None, ERROR_BULK_INVALID_JSON_VALUE_FORMAT.format(permission.name)
+
+        if not permission_configs:
+            return None, ERROR_BULK_UNSPECIFIED_CHANGES
+        return permission_configs, None
+
+    def get_channel_error_text(self, server: Guild, channel_ids: list) -> str:
+        if not channel_ids:
+            return ERROR_UNSPECIFIED_CHANNEL
+        for channel_id in channel_ids:
+            if not self.is_available_channel(server, channel_id):
+                return ERROR_INVALID_CHANNEL_FORMAT.format(f'<#{channel_id}>')
+        return None
+
     def is_available_channel(self, server: Guild, channel_id: int) -> bool:
         bot_member = server.get_member(self.bot.user.id)
         channel = server.get_channel(channel_id)
         return channel and channel.permissions_for(bot_member).send_messages
 
     async def get_permission_config_for_server(self, server_id: int, permission: Permission) -> PermissionConfig:
+        return (await self.get_server_permissions(server_id)).get_config(permission)
+
+    async def get_server_permissions(self, server_id: int) -> ServerPermissions:
+        """ Returns the snapshot of the server's current permission settings.
+
+        Snapshots are never modified, only replaced, so reading one doesn't require the lock. The lock is only taken
+        when the server's snapshot hasn't been loaded yet, so that it's loaded once (and not alongside any writes).
+        """
+        server_permissions = self.cache.get(server_id)
+        if server_permissions is None:
+            async with self.cache_lock:
+                server_permissions = await self.load_server_permissions(server_id)
+        return server_permissions
+
+    async def load_server_permissions(self, server_id: int) -> ServerPermissions:
+        """ Loads all of the server's permission configs with a single query. The cache lock must already be held. """
+        server_permissions = self.cache.get(server_id)
+        if server_permissions is None:
+            query = 'SELECT permission_id, is_enabled, whitelisted_channel_ids FROM permissions WHERE server_id=?'
+            rows = await self.database.fetchall(query, (server_id,))
+            server_permissions = self.create_server_permissions(server_id, rows)
+            self.cache[server_id] = server_permissions
+        return server_permissions
+
+    async def load_all_server_permissions(self):
+        """ Loads the permission configs for every server the bot is in, with a single query for all of them. """
+        rows_by_server_id = {server.id: [] for server in self.bot.guilds}
+
         async with self.cache_lock:
-            if server_id not in self.cache:
-                self.cache[server_id] = {}
-
-            if permission.id not in self.cache[server_id]:
-                async with connect(self.db) as connection:
-                    query = 'SELECT * FROM permissions WHERE server_id=? AND permission_id=?'
-                    async with connection.execute(query, (server_id, permission.id)) as cursor:
-                        row = await cursor.fetchone()
-                        if row:
-                            server = self.bot.get_guild(server_id)
-                            whitelisted_channel_ids = set()
-                            for channel_id in loads(row[3]):
-                                if self.is_available_channel(server, channel_id):
-                                    whitelisted_channel_ids.add(channel_id)
-                                else:
-                                    log(f'WARNING: Channel {channel_id} in "{server.name}" is no longer available.')
-                            permission_config = PermissionConfig.get_config(
-                                is_enabled=row[2], whitelisted_channel_ids=frozenset(whitelisted_channel_ids))
-                        else:
-                            permission_config = PermissionConfig.get_default_config_for_permission(permission)
-                self.cache[server_id][permission.id] = permission_config
-
-            return self.cache[server_id][permission.id]
+            query = 'SELECT server_id, permission_id, is_enabled, whitelisted_channel_ids FROM permissions'
+            for (server_id, *row) in await self.database.fetchall(query):
+                if server_id in rows_by_server_id:
+                    rows_by_server_id[server_id].append(row)
+
+            for server_id, rows in rows_by_server_id.items():
+                if server_id not in self.cache:  # Otherwise, it was already loaded (and possibly changed) on demand.
+                    self.cache[server_id] = self.create_server_permissions(server_id, rows)
+
+        log(f'Loaded the permission configs for {len(rows_by_server_id)} server(s).')
+
+    def create_server_permissions(self, server_id: int, rows: list) -> ServerPermissions:
+        server = self.bot.get_guild(server_id)
+        server_permissions = DEFAULT_SERVER_PERMISSIONS
+
+        for (permission_id, is_enabled, whitelisted_channel_ids_json) in rows:
+            whitelisted_channel_ids = set()
+            for channel_id in loads(whitelisted_channel_ids_json):
+                if self.is_available_channel(server, channel_id):
+                    whitelisted_channel_ids.add(channel_id)
+                else:
+                    log(f'WARNING: Channel {channel_id} in "{server.name}" is no longer available.')
+            if permission_id in PERMISSIONS_BY_ID:
+                permission_config = PermissionConfig.get_config(
+                    is_enabled=bool(is_enabled), whitelisted_channel_ids=frozenset(whitelisted_channel_ids))
+                server_permissions = server_permissions.with_config(PERMISSIONS_BY_ID[permission_id], permission_config)
+
+        return server_permissions
 
     async def save_permission_config_for_server(
             self, server_id: int, permission: Permission, permission_config: PermissionConfig):
-        if permission_config == PermissionConfig.get_default_config_for_permission(permission):
-            # Setting to the default config is effectively the same as resetting the config, so favor the simpler path.
-            await self.reset_permission_config_for_server(server_id, permission)
-            return
+        await self.save_permission_configs_for_server(server_id, {permission: permission_config})
 
+    async def save_permission_configs_for_server(self, server_id: int, permission_configs: dict):
+        """ Saves the given configs (keyed by permission) in a single transaction, then swaps in a single new snapshot.
+        """
         async with self.cache_lock:
-            if server_id not in self.cache:
-                self.cache[server_id] = {}
-
-            self.cache[server_id][permission.id] = permission_config
-
-            async with connect(self.db) as connection:
-                is_enabled = permission_config.is_enabled
-                whitelisted_channel_ids = dumps(sorted(permission_config.whitelisted_channel_ids))
-                await connection.execute('INSERT INTO permissions'
-                                         '    (server_id, permission_id, is_enabled, whitelisted_channel_ids)'
-                                         'VALUES (?, ?, ?, ?) '
-                                         'ON CONFLICT (server_id, permission_id) '
-                                         'DO UPDATE SET is_enabled=?, whitelisted_channel_ids=?',
-                                         (server_id, permission.id, is_enabled, whitelisted_channel_ids,
-                                          is_enabled, whitelisted_channel_ids))
-                await connection.commit()
-
-    async def reset_permission_config_for_server(self, server_id: int, permission: Permission):
-        async with self.cache_lock:
-            if server_id not in self.cache:
-                self.cache[server_id] = {}
-
-            self.cache[server_id][permission.id] = PermissionConfig.get_default_config_for_permission(permission)
-
-            async with connect(self.db) as connection:
-                await connection.execute(
-                    'DELETE FROM permissions WHERE server_id=? AND permission_id=?', (server_id, permission.id))
-                await connection.commit()
+            server_permissions = await self.load_server_permissions(server_id)
+
+            async with self.database.transaction() as connection:
+                for permission, permission_config in permission_configs.items():
+                    if permission_config == PermissionConfig.get_default_config_for_permission(permission):
+                        # Setting a permission to its default config is the same as resetting it, so delete its row.
+                        await connection.execute(
+                            'DELETE FROM permissions WHERE server_id=? AND permission_id=?', (server_id, permission.id))
+                    else:
+                        is_enabled = permission_config.is_enabled
+                        whitelisted_channel_ids = dumps(sorted(permission_config.whitelisted_channel_ids))
+                        await connection.execute('INSERT INTO permissions'
+                                                 '    (server_id, permission_id, is_enabled, whitelisted_channel_ids)'
+                                                 'VALUES (?, ?, ?, ?) '
+                                                 'ON CONFLICT (server_id, permission_id) '
+                                                 'DO UPDATE SET is_enabled=?, whitelisted_channel_ids=?',
+                                                 (server_id, permission.id, is_enabled, whitelisted_channel_ids,
+                                                  is_enabled, whitelisted_channel_ids))
+                    server_permissions = server_permissions.with_config(permission, permission_config)
+
+            # Swap in the new snapshot only once the changes have been saved, so that readers never see unsaved changes.
+            self.replace_server_permissions(server_id, server_permissions)
 
 
 def setup(bot: Bot):
@@ -1,5 +1,3 @@
-import json
-import os.path
 from discord.ext import commands
 from lib.embeds import *
 from lib.prefixes import *
@@ -39,6 +37,10 @@ class Prefix(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        self.bot.loop.create_task(load_prefixes())
+
+    def cog_unload(self):
+        self.bot.loop.create_task(flush_prefixes())
 
     @commands.command(aliases=['pf'])
     async def prefix(self, ctx, command: str = None, *args):
@@ -62,21 +64,7 @@ class Prefix(commands.Cog):
 
     @staticmethod
     async def set_prefix(ctx, new_prefix):
-        prefixes = {}
-
-        if os.path.isfile(PREFIXES_PATH):
-            with open(PREFIXES_PATH, 'r') as file:
-                prefixes = json.load(file)
-
-        server_id = str(ctx.guild.id)
-        if (new_prefix == DEFAULT_PREFIX) and (server_id in prefixes):
-            prefixes.pop(server_id)
-        else:
-            prefixes[server_id] = new_prefix
-
-        with open(PREFIXES_PATH, 'w+') as file:
-            json.dump(prefixes, file, indent=4)
-
+        update_prefix(ctx.guild.id, new_prefix)
         embed_text = TEXT_UPDATED_FORMAT.format(ctx.guild.name, new_prefix)
         await ctx.send(embed=create_basic_embed(embed_text, EMOJI_SUCCESS))
 
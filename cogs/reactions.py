@@ -1,12 +1,23 @@
 import asyncio
 import json
-import sqlite3
+from dataclasses import dataclass, replace
 from datetime import datetime
-from discord import HTTPException
+from math import ceil
+from time import monotonic
+from types import MappingProxyType
+from weakref import WeakValueDictionary
+from discord import HTTPException, NotFound
 from discord.ext import commands
+from lib.cleanup import CLEANUP_JOB_CANCELLED, CLEANUP_JOB_COMPLETED, CLEANUP_JOB_FAILED, CLEANUP_JOB_RUNNING, \
+    CleanupJob, remove_reactions
+from lib.db import get_database
+from lib.dm import queue_dm
 from lib.embeds import *
+from lib.metrics import increment_counter, record_timing, set_gauge
 from lib.prefixes import get_prefix
-from lib.utils import log, extract_message_id, fetch_message, get_message_link_string
+from lib.utils import log, extract_message_id, fetch_message, gather_with_concurrency, get_message_link, \
+    get_message_link_string, RateLimiter
+from lib.workqueue import WorkQueue
 from secrets import SUPER_USERS
 
 CONFIRMATION_TYPE_NONE = 0
@@ -86,17 +97,213 @@ SESSION_TIMEOUT_SECONDS = 180  # 3 minutes
 
 TITLE_CLEANUP = 'Reaction/Role Cleanup'
 BULK_CLEANUP_MESSAGE_LIMIT = 5
+CLEANUP_FETCH_CONCURRENCY = 4  # How many messages (or reactions per message) to fetch the users for at the same time.
+
+CLEANUP_CHECKPOINT_SIZE = 20  # How many reactions to remove between two checkpoints of a cleanup job.
+CLEANUP_PROGRESS_INTERVAL_SECONDS = 5  # The minimum amount of time between two progress updates of a cleanup job.
+CLEANUP_JOBS_LIST_LIMIT = 10
+
+LIST_PAGE_SIZE = 15
+LIST_VALIDATE_CONCURRENCY = 5  # How many configured messages to fetch at the same time during "ra list validate".
+
+# This format string expects the following arguments in order: job_id, message_link_string, progress_text, command
+TEXT_CLEANUP_PROGRESS_FORMAT = '** **\nCleanup job **#{0}** is in progress for message **{1}**... \u200B \u200B ' \
+                               '{2} reactions processed so far.\n\nUse {3} to cancel it.\n\n'
 
 REACTION_ADD = 'reaction_add'
 REACTION_REMOVE = 'reaction_remove'
 
-DATA_KEY_MESSAGE_ID = 'message_id'
-DATA_KEY_CHANNEL_ID = 'channel_id'
-DATA_KEY_REACTION_ROLES = 'reaction_roles'
+METRIC_ROLE_LOCK_WAIT = 'reactions.role_lock_wait'
+METRIC_COALESCED_EVENTS = 'reactions.coalesced_events'
+METRIC_ECHOED_REMOVALS = 'reactions.echoed_removals'
+METRIC_RECONCILED_MEMBERS = 'reactions.reconciled_members'
+METRIC_QUEUE_DEPTH = 'reactions.queue_depth'
+METRIC_QUEUE_OVERFLOWS = 'reactions.queue_overflows'
+
+REACTION_COALESCE_SECONDS = 1  # How long to collect one member's reactions on a message before acting on them.
+REACTION_QUEUE_SIZE = 100  # How many members' reactions a server can have queued before new ones are deferred.
+REACTION_WORKERS_PER_SERVER = 2  # How many members' reactions are handled at the same time in one server.
+REACTION_WORKERS_TOTAL = 8  # How many members' reactions are handled at the same time across all servers.
+EXPECTED_REMOVAL_TIMEOUT_SECONDS = 30  # How long to wait for the event caused by one of the bot's reaction removals.
+
+RECONCILE_CONCURRENCY = 2  # How many servers to reconcile at the same time.
+RECONCILE_REQUESTS_PER_SECOND = 2  # The API budget for reconciling, shared by all servers.
+RECONCILE_MESSAGES_PER_PASS = 25  # How many messages to reconcile per server before moving on to the next server.
+RECONCILE_REQUESTS_PER_RUN = 500  # The API budget for reconciling one server each time the bot (re)connects.
+REACTION_USERS_PAGE_SIZE = 100  # The most reactors that Discord returns per request.
+
+# Whether reconciling may take roles away from members, in servers that haven't changed it with "ra reconcile". A
+# member can hold a menu's role without reacting to it (e.g. if an admin gave it to them by hand), and the bot can't
+# tell that apart from a reaction that was removed while it was offline, so this is off by default.
+RECONCILE_REMOVES_ROLES_BY_DEFAULT = False
+
+
+@dataclass(frozen=True)
+class CompiledConfig:
+    """ An immutable, pre-processed form of a message's reaction/role config, which reaction events are handled with.
+
+    It's compiled whenever the config is loaded or saved, so handling an event never has to parse a role string or
+    search through the reaction/role menu. Roles are kept by ID and resolved with Guild.get_role, a dict lookup.
+    """
+
+    message_id: int
+    channel_id: int
+    server_id: int
+    message_link: str
+    is_reactive: bool
+    allow_multiselect: bool
+    allow_cancellation: bool
+    confirmation_type: int
+    confirmation_channel_id: int
+    menu: tuple  # The (emoji, role_id) pairs of the reaction/role menu, in order.
+    role_ids: MappingProxyType  # Maps each emoji in the menu to its role ID.
+    available_emoji: frozenset
 
-CACHE_KEY_DATA = 'data'
-CACHE_KEY_TIMESTAMP = 'timestamp'
-CACHE_TTL_SECONDS = 3600  # 1 hour
+    @staticmethod
+    def compile(message_id, channel_id, server_id, config):
+        menu = tuple((str(reaction), Reactions.get_role_id_from_role_str(role_str))
+                     for reaction, role_str in config[KEY_REACTION_ROLE_MENU])
+        return CompiledConfig(
+            message_id=message_id, channel_id=channel_id, server_id=server_id,
+            message_link=get_message_link(server_id, channel_id, message_id),
+            is_reactive=config[KEY_IS_REACTIVE], allow_multiselect=config[KEY_ALLOW_MULTISELECT],
+            allow_cancellation=config[KEY_ALLOW_CANCELLATION], confirmation_type=config[KEY_CONFIRMATION_TYPE],
+            confirmation_channel_id=config[KEY_CONFIRMATION_CHANNEL_ID], menu=menu,
+            role_ids=MappingProxyType(dict(menu)), available_emoji=frozenset(emoji for emoji, role_id in menu))
+
+    def without_role(self, role_id):
+        menu = tuple((emoji, menu_role_id) for emoji, menu_role_id in self.menu if menu_role_id != role_id)
+        return replace(self, menu=menu, role_ids=MappingProxyType(dict(menu)),
+                       available_emoji=frozenset(emoji for emoji, menu_role_id in menu))
+
+    def get_role(self, emoji, server):
+        role_id = self.role_ids.get(str(emoji))
+        return server.get_role(role_id) if role_id else None
+
+    def get_roles(self, server):
+        return [role for role in (server.get_role(role_id) for emoji, role_id in self.menu) if role]
+
+
+class RoleUpdate:
+    """ Collects the changes that a batch of reaction events will make for one member, so they can be applied at once.
+
+    "roles" starts out as a copy of the member's current roles, and is then updated as each event is planned. Members
+    who have left the server (and are therefore only available as Users) simply start out with no roles.
+    "reacted_emoji" holds the emoji that the batch shows the member has reacted with. Holding a role doesn't mean that
+    the member ever reacted for it (the role could have been given by hand), so only these reactions are known to exist.
+    """
+
+    def __init__(self, member):
+        self.member = member
+        self.initial_roles = frozenset(getattr(member, 'roles', ()))
+        self.roles = set(self.initial_roles)
+        self.reactions_to_remove = []
+        self.reacted_emoji = set()
+        self.notices = []
+
+
+class ReconcileState:
+    """ Tracks how far one server has been reconciled during the current run, and what has been learned so far.
+
+    "role_reactor_ids" maps each role to the IDs of the members who reacted for it on any of the messages reconciled so
+    far, and "kept_roles" collects the roles that can't be taken away from anyone, because one of their messages
+    doesn't allow cancellations or couldn't be read. Roles are only ever taken away once every message is covered.
+    """
+
+    def __init__(self, server, message_ids, removes_roles):
+        self.server = server
+        self.remaining_message_ids = message_ids
+        self.removes_roles = removes_roles
+        self.requests_left = RECONCILE_REQUESTS_PER_RUN
+        self.role_reactor_ids = {}
+        self.kept_roles = set()
+
+
+async def create_reactions_tables(connection):
+    await connection.execute(
+        '''CREATE TABLE IF NOT EXISTS `reactions` (
+            `message_id` INTEGER PRIMARY KEY UNIQUE,
+            `channel_id` INTEGER,
+            `server_id` INTEGER,
+            `is_reactive` BOOLEAN,
+            `allow_multiselect` BOOLEAN,
+            `allow_cancellation` BOOLEAN,
+            `confirmation_type` INTEGER,
+            `confirmation_channel_id` INTEGER,
+            `reaction_role_menu` TEXT NOT NULL
+        );''')
+    await connection.execute(
+        '''CREATE TABLE IF NOT EXISTS `cleanup_jobs` (
+            `job_id` INTEGER PRIMARY KEY AUTOINCREMENT,
+            `server_id` INTEGER,
+            `channel_id` INTEGER,
+            `preview_message_id` INTEGER,
+            `target_channel_id` INTEGER,
+            `target_message_id` INTEGER,
+            `removals` TEXT NOT NULL,
+            `progress` INTEGER,
+            `removed_count` INTEGER,
+            `status` TEXT
+        );''')
+
+
+async def split_reaction_role_menus(connection):
+    # Each reaction/role pairing gets its own row, instead of the whole menu being stored as a JSON string.
+    await connection.execute(
+        '''CREATE TABLE `reaction_roles` (
+            `message_id` INTEGER NOT NULL,
+            `emoji` TEXT NOT NULL,
+            `role_id` INTEGER NOT NULL,
+            `position` INTEGER NOT NULL,
+            PRIMARY KEY (`message_id`, `emoji`)
+        ) WITHOUT ROWID;''')
+    async with connection.execute('SELECT message_id, reaction_role_menu FROM reactions') as cursor:
+        rows = await cursor.fetchall()
+    await connection.executemany(
+        'INSERT OR IGNORE INTO reaction_roles VALUES (?, ?, ?, ?)',
+        [(message_id, str(reaction), Reactions.get_role_id_from_role_str(role_str), position)
+         for message_id, menu_json in rows for position, (reaction, role_str) in enumerate(json.loads(menu_json))])
+
+    # SQLite can't drop a column, so the table is rebuilt without it.
+    await connection.execute(
+        '''CREATE TABLE `reactions_new` (
+            `message_id` INTEGER PRIMARY KEY,
+            `channel_id` INTEGER NOT NULL,
+            `server_id` INTEGER NOT NULL,
+            `is_reactive` BOOLEAN,
+            `allow_multiselect` BOOLEAN,
+            `allow_cancellation` BOOLEAN,
+            `confirmation_type` INTEGER,
+            `confirmation_channel_id` INTEGER
+        );''')
+    await connection.execute('INSERT INTO reactions_new SELECT message_id, channel_id, server_id, is_reactive, '
+                             'allow_multiselect, allow_cancellation, confirmation_type, confirmation_channel_id '
+                             'FROM reactions')
+    await connection.execute('DROP TABLE reactions')
+    await connection.execute('ALTER TABLE reactions_new RENAME TO reactions')
+    await connection.execute('CREATE INDEX `reactions_server_id` ON `reactions` (`server_id`)')
+    await connection.execute('CREATE INDEX `reactions_channel_id` ON `reactions` (`channel_id`)')
+
+
+async def create_reconcile_checkpoints_table(connection):
+    await connection.execute(
+        '''CREATE TABLE `reconcile_checkpoints` (
+            `server_id` INTEGER PRIMARY KEY,
+            `message_id` INTEGER NOT NULL
+        );''')
+
+
+async def create_reconcile_settings_table(connection):
+    await connection.execute(
+        '''CREATE TABLE `reconcile_settings` (
+            `server_id` INTEGER PRIMARY KEY,
+            `removes_roles` BOOLEAN NOT NULL
+        );''')
+
+
+# The migrations for data/reactions.db, in order. Never change or remove one of these, only add new ones at the end.
+REACTIONS_DB_MIGRATIONS = [create_reactions_tables, split_reaction_role_menus, create_reconcile_checkpoints_table,
+                           create_reconcile_settings_table]
 
 
 class Reactions(commands.Cog):
@@ -109,9 +316,15 @@ class Reactions(commands.Cog):
         KEY_SUBCOMMANDS: [
             {
                 KEY_EMOJI: '🧾',
-                KEY_TITLE: 'list',
+                KEY_TITLE: 'list [page]',
                 KEY_DESCRIPTION: 'Lists all of the messages on this server that have reaction/role configurations.',
-                KEY_EXAMPLE: '!cb ra list'
+                KEY_EXAMPLE: '!cb ra list 2'
+            },
+            {
+                KEY_EMOJI: '🔍',
+                KEY_TITLE: 'list validate',
+                KEY_DESCRIPTION: 'Checks that the listed messages still exist, and forgets the ones that don\'t.',
+                KEY_EXAMPLE: '!cb ra list validate'
             },
             {
                 KEY_EMOJI: '🛠️',
@@ -136,38 +349,85 @@ class Reactions(commands.Cog):
                 KEY_TITLE: 'cleanup [message link]',
                 KEY_DESCRIPTION: 'Removes obsolete and/or mismatched reactions from the linked message.',
                 KEY_EXAMPLE: '!cb ra cleanup https://discord.com/URL'
+            },
+            {
+                KEY_EMOJI: '⏳',
+                KEY_TITLE: 'jobs',
+                KEY_DESCRIPTION: 'Shows the status of the most recent reaction cleanup jobs on this server.',
+                KEY_EXAMPLE: '!cb ra jobs'
+            },
+            {
+                KEY_EMOJI: '🛑',
+                KEY_TITLE: 'cancel [job ID]',
+                KEY_DESCRIPTION: 'Cancels a reaction cleanup job that is still in progress.',
+                KEY_EXAMPLE: '!cb ra cancel 42'
+            },
+            {
+                KEY_EMOJI: '🔁',
+                KEY_TITLE: 'reconcile [on/off]',
+                KEY_DESCRIPTION: 'Shows or sets whether roles are taken away from members who removed their reaction '
+                                 'while I was offline. Leave this off if roles are also given out by hand.',
+                KEY_EXAMPLE: '!cb ra reconcile on'
             }
         ]
     }
 
     def __init__(self, bot):
         self.bot = bot
-        self.cache = {}
-        self.cache_lock = asyncio.Lock()
-        self.role_lock = asyncio.Lock()
-        with sqlite3.connect(self.db) as connection:
-            c = connection.cursor()
-            c.execute(
-                '''CREATE TABLE IF NOT EXISTS `reactions` (
-                    `message_id` INTEGER PRIMARY KEY UNIQUE,
-                    `channel_id` INTEGER,
-                    `server_id` INTEGER,
-                    `is_reactive` BOOLEAN,
-                    `allow_multiselect` BOOLEAN,
-                    `allow_cancellation` BOOLEAN,
-                    `confirmation_type` INTEGER,
-                    `confirmation_channel_id` INTEGER,
-                    `reaction_role_menu` TEXT NOT NULL
-                );''')
-            connection.commit()
-            c.close()
+        self.configs = {}  # Maps the ID of every configured message to its config. Kept in sync with the database.
+        self.config_lock = asyncio.Lock()
+        self.role_locks = WeakValueDictionary()  # Maps (server ID, user ID) to a lock, while that lock is in use.
+        self.pending_reaction_events = {}  # Maps (message ID, user ID) to the events that are waiting to be handled.
+        self.reaction_work_queues = {}  # Maps server IDs to the WorkQueue that handles the server's reaction events.
+        self.reaction_worker_semaphore = asyncio.Semaphore(REACTION_WORKERS_TOTAL)
+        self.tracked_messages = {}  # Maps the ID of every configured message to its CompiledConfig.
+        self.cleanup_preview_message_ids = set()  # IDs of cleanup previews that are waiting for a confirmation.
+        self.cleanup_jobs = {}  # Maps the ID of every cleanup job that is currently running to the job.
+        self.expected_reaction_removals = {}  # Maps (message ID, user ID, emoji) to a deadline, oldest deadline first.
+        self.configs_loaded = asyncio.Event()
+        self.reconcile_task = None
+        self.reconcile_settings = {}  # Maps server IDs to whether reconciling may take roles away in that server.
+        self.reconcile_rate_limiter = RateLimiter(RECONCILE_REQUESTS_PER_SECOND)
+        self.database = get_database(self.db)
+        self.bot.loop.create_task(self.initialize_database())
+
+    async def initialize_database(self):
+        await self.database.migrate(REACTIONS_DB_MIGRATIONS)
+
+        menus = {}
+        for message_id, emoji, role_id in await self.database.fetchall(
+                'SELECT message_id, emoji, role_id FROM reaction_roles ORDER BY message_id, position'):
+            menus.setdefault(message_id, []).append([emoji, Reactions.get_role_str_from_role_id(role_id)])
+        for row in await self.database.fetchall('SELECT * FROM reactions ORDER BY message_id'):
+            self.cache_config(row[0], row[1], row[2], Reactions.get_config_from_row(row, menus.get(row[0], [])))
+        log(f'Tracking reaction/role configurations for {len(self.configs)} message(s).')
+        self.reconcile_settings.update(
+            (server_id, bool(removes_roles)) for server_id, removes_roles in
+            await self.database.fetchall('SELECT server_id, removes_roles FROM reconcile_settings'))
+        self.configs_loaded.set()
+
+        # Cleanup jobs that were interrupted by a restart pick up again from their last checkpoint.
+        await self.bot.wait_until_ready()
+        rows = await self.database.fetchall('SELECT * FROM cleanup_jobs WHERE status=? ORDER BY job_id',
+                                            (CLEANUP_JOB_RUNNING,))
+        for row in rows:
+            if row[0] not in self.cleanup_jobs:
+                log(f'CLEANUP: Resuming job #{row[0]} at {row[7]} of {len(json.loads(row[6]))} reaction(s).')
+                self.start_cleanup_job(Reactions.get_cleanup_job_from_row(row))
+
+    def cog_unload(self):
+        for work_queue in self.reaction_work_queues.values():
+            work_queue.close()
+        self.reaction_work_queues.clear()
 
     @commands.command(aliases=['reaction', 'ra'])
     async def reactions(self, ctx, command: str = None, *args):
         if self.bot.get_cog('RASession'):
             return  # Message will be handled by the active RASession.
-        elif command == 'list' and len(args) == 0:
-            await self.list(ctx)
+        elif command == 'list' and len(args) == 1 and args[0] == 'validate':
+            await self.validate_list(ctx)
+        elif command == 'list' and len(args) <= 1:
+            await self.list(ctx, *args)
         elif command == 'config' and len(args) == 1:
             await self.config(ctx, args[0])
         elif command == 'copy' and len(args) == 2:
@@ -176,10 +436,22 @@ class Reactions(commands.Cog):
             await self.reset(ctx, args[0])
         elif command == 'cleanup' and len(args) == 1:
             await self.cleanup(ctx, args[0])
+        elif command == 'jobs' and len(args) == 0:
+            await self.jobs(ctx)
+        elif command == 'cancel' and len(args) == 1:
+            await self.cancel(ctx, args[0])
+        elif command == 'reconcile' and len(args) <= 1 and all(arg in ('on', 'off') for arg in args):
+            await self.set_reconcile_removals(ctx, *args)
         else:
             prefix = get_prefix(self.bot, ctx.message)
             await ctx.send(embed=create_help_embed(self.help, prefix))
 
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # This also runs after every reconnect, since reactions may have been missed while the bot was disconnected.
+        if not self.reconcile_task or self.reconcile_task.done():
+            self.reconcile_task = self.bot.loop.create_task(self.reconcile())
+
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, event):
         await self.on_raw_reaction_event(event, REACTION_ADD)
@@ -188,8 +460,63 @@ class Reactions(commands.Cog):
     async def on_raw_reaction_remove(self, event):
         await self.on_raw_reaction_event(event, REACTION_REMOVE)
 
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, event):
+        await self.delete_configs_for_deleted_messages(event.guild_id, {event.message_id})
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, event):
+        await self.delete_configs_for_deleted_messages(event.guild_id, event.message_ids)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        message_ids = {message_id for message_id, compiled_config in self.tracked_messages.items()
+                       if compiled_config.channel_id == channel.id}
+        await self.delete_configs_for_deleted_messages(channel.guild.id, message_ids)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, server):
+        # The server's workers are shut down, and the events they would have handled are dropped along with them.
+        work_queue = self.reaction_work_queues.pop(server.id, None)
+        if work_queue:
+            work_queue.close()
+        for key in [key for key in self.pending_reaction_events
+                    if getattr(self.tracked_messages.get(key[0]), 'server_id', None) == server.id]:
+            del self.pending_reaction_events[key]
+        self.update_queue_depth_gauge()
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        # Reactions for a deleted role are dropped from the compiled configs, so that events for them are ignored.
+        for message_id, compiled_config in self.tracked_messages.items():
+            if (compiled_config.server_id == role.guild.id) and (role.id in compiled_config.role_ids.values()):
+                log(f'WARNING: Deleted role "{role.name}" is still assigned in {compiled_config.message_link}.')
+                self.tracked_messages[message_id] = compiled_config.without_role(role.id)
+
+    async def delete_configs_for_deleted_messages(self, server_id, message_ids):
+        self.cleanup_preview_message_ids.difference_update(message_ids)
+        for message_id in message_ids & self.tracked_messages.keys():
+            log(f'Deleting reaction/role configuration for message {message_id}, which no longer exists.')
+            await self.delete_config_for_message(server_id, message_id)
+
     async def on_raw_reaction_event(self, event, event_type):
         emoji = str(event.emoji)
+        is_expected_removal = self.is_expected_reaction_removal(event.message_id, event.user_id, emoji) \
+            if event_type == REACTION_REMOVE else False
+        if is_expected_removal:
+            increment_counter(METRIC_ECHOED_REMOVALS)
+            return  # The bot removed this reaction itself, and has already accounted for it.
+
+        compiled_config = self.tracked_messages.get(event.message_id)
+        is_tracked_reaction = (compiled_config is not None) and (event.channel_id == compiled_config.channel_id) \
+            and (emoji in compiled_config.available_emoji)
+        is_cleanup_confirmation = (emoji == EMOJI_SUCCESS) and (event_type == REACTION_ADD) \
+            and (event.message_id in self.cleanup_preview_message_ids)
+
+        # Most reactions aren't on a configured message, so return before doing any lookups or API calls for them.
+        if (not event.guild_id) or not (is_tracked_reaction or is_cleanup_confirmation):
+            return
+
         server = self.bot.get_guild(event.guild_id)
         user = server.get_member(event.user_id)
 
@@ -199,23 +526,19 @@ class Reactions(commands.Cog):
         if user and user.bot:
             return
 
-        if (emoji == EMOJI_SUCCESS) and (event_type == REACTION_ADD):
+        if is_cleanup_confirmation:
             message = await server.get_channel(event.channel_id).fetch_message(event.message_id)
             if (message and (message.author == self.bot.user) and (len(message.embeds) == 1)
                     and (message.embeds[0].title == TITLE_CLEANUP)):
+                self.cleanup_preview_message_ids.discard(message.id)
                 async with message.channel.typing():
                     await self.handle_reaction_cleanup(message)
 
-        server_info = await self.get_reaction_roles_for_server(server.id)
-        for message_info in server_info:
-            if ((event.message_id == message_info[DATA_KEY_MESSAGE_ID])
-                    and (event.channel_id == message_info[DATA_KEY_CHANNEL_ID])
-                    and (emoji in message_info[DATA_KEY_REACTION_ROLES])):
-                channel = server.get_channel(message_info[DATA_KEY_CHANNEL_ID])
-                message = await channel.fetch_message(message_info[DATA_KEY_MESSAGE_ID])
-                log(f'{user.name}#{user.discriminator} {"" if event_type == REACTION_ADD else "un-"}'
-                    f'reacted to message {message.id} with "{emoji}".')
-                await self.handle_reaction_event(message, user, emoji, event_type)
+        if is_tracked_reaction:
+            channel = server.get_channel(compiled_config.channel_id)
+            log(f'{user.name}#{user.discriminator} {"" if event_type == REACTION_ADD else "un-"}'
+                f'reacted to message {event.message_id} with "{emoji}".')
+            self.queue_reaction_event(channel, event.message_id, user, emoji, event_type)
 
     async def handle_reaction_cleanup(self, preview_message):
         embed = preview_message.embeds[0]
@@ -225,7 +548,6 @@ class Reactions(commands.Cog):
         expected_length = len(actual_reactions)
         preview_emojis = embed.fields[1].value.split('\n')
         preview_mentions = embed.fields[2].value.split('\n')
-        user_cache = {}
 
         if (len(preview_emojis) != expected_length) or (len(preview_mentions) != expected_length):
             await self.handle_reaction_cleanup_error(preview_message, embed)
@@ -237,26 +559,120 @@ class Reactions(commands.Cog):
                 await self.handle_reaction_cleanup_error(preview_message, embed)
                 return
 
-        for (reaction, user_text, reason_text) in actual_reactions:
-            user_id = user_ids[user_text]
-            if user_id not in user_cache:
-                user_cache[user_id] = await self.bot.fetch_user(user_id)
-            user = user_cache[user_id]
-            log(f'CLEANUP: Removing {user.name}#{user.discriminator}\'s "{reaction.emoji}" '
-                f'reaction from message {target_message.id}.')
-            await reaction.remove(user)
-
-        embed.title += ' [COMPLETED]'
-        target_message_link_string = get_message_link_string(target_message.jump_url)
+        removals = [(str(reaction.emoji), user_ids[user_text]) for (reaction, user_text, reason) in actual_reactions]
+        async with self.database.transaction() as connection:
+            async with connection.execute('INSERT INTO cleanup_jobs VALUES (NULL, ?, ?, ?, ?, ?, ?, 0, 0, ?)',
+                                          (preview_message.guild.id, preview_message.channel.id, preview_message.id,
+                                           target_message.channel.id, target_message.id, json.dumps(removals),
+                                           CLEANUP_JOB_RUNNING)) as cursor:
+                job_id = cursor.lastrowid
+
+        log(f'CLEANUP: Starting job #{job_id} to remove {len(removals)} reaction(s) from message {target_message.id}.')
+        job = CleanupJob(job_id, preview_message.guild.id, preview_message.channel.id, preview_message.id,
+                         target_message.channel.id, target_message.id, removals)
+        self.start_cleanup_job(job, preview_message)
+
+    def start_cleanup_job(self, job, preview_message=None):
+        self.cleanup_jobs[job.job_id] = job
+        self.bot.loop.create_task(self.run_cleanup_job(job, preview_message))
+
+    async def run_cleanup_job(self, job, preview_message=None):
+        # The job runs in the background, so that it doesn't hold up the command (or the reaction event) that started
+        # it. Its progress is checkpointed to the database regularly, so a restart only repeats the last few removals.
+        try:
+            server = self.bot.get_guild(job.server_id)
+            target_channel = server and server.get_channel(job.target_channel_id)
+            if not target_channel:
+                log(f'CLEANUP: Job #{job.job_id} failed because channel {job.target_channel_id} no longer exists.')
+                job.status = CLEANUP_JOB_FAILED
+            else:
+                if not preview_message:
+                    preview_message = await Reactions.fetch_cleanup_preview(server, job)
+                target_message = target_channel.get_partial_message(job.target_message_id)
+                reported_at = monotonic()
+
+                while (job.status == CLEANUP_JOB_RUNNING) and (job.progress < len(job.removals)):
+                    batch = job.removals[job.progress:job.progress + CLEANUP_CHECKPOINT_SIZE]
+                    # The removal events can arrive before the requests return, so they're expected up front, and the
+                    # expectations for the removals that failed are dropped afterwards.
+                    for emoji, user_id in batch:
+                        self.expect_reaction_removal(job.target_message_id, user_id, emoji)
+                    removed = await remove_reactions([(target_message, emoji, user_id) for emoji, user_id in batch])
+                    removed_pairs = {(emoji, user_id) for _, emoji, user_id in removed}
+                    for emoji, user_id in batch:
+                        if (emoji, user_id) not in removed_pairs:
+                            self.forget_reaction_removal(job.target_message_id, user_id, emoji)
+                    job.removed_count += len(removed)
+                    job.progress += len(batch)
+                    await self.database.execute('UPDATE cleanup_jobs SET progress=?, removed_count=? WHERE job_id=?',
+                                                (job.progress, job.removed_count, job.job_id))
+
+                    if preview_message and (monotonic() - reported_at >= CLEANUP_PROGRESS_INTERVAL_SECONDS):
+                        reported_at = monotonic()
+                        try:
+                            await self.show_cleanup_job_progress(job, preview_message)
+                        except HTTPException:
+                            preview_message = None  # The job carries on even if its preview message was deleted.
+
+                if job.status == CLEANUP_JOB_RUNNING:
+                    job.status = CLEANUP_JOB_COMPLETED
+        except Exception as error:
+            log(f'CLEANUP: Job #{job.job_id} failed: {error}')
+            job.status = CLEANUP_JOB_FAILED
+
+        await self.database.execute('UPDATE cleanup_jobs SET status=? WHERE job_id=?', (job.status, job.job_id))
+        self.cleanup_jobs.pop(job.job_id, None)
+        log(f'CLEANUP: Job #{job.job_id} is {job.status} after removing {job.removed_count} reaction(s).')
+        if preview_message:
+            await self.show_cleanup_job_result(job, preview_message)
+
+    @staticmethod
+    async def fetch_cleanup_preview(server, job):
+        channel = server.get_channel(job.channel_id)
+        try:
+            return await channel.fetch_message(job.preview_message_id) if channel else None
+        except HTTPException:
+            return None
+
+    async def show_cleanup_job_progress(self, job, preview_message):
+        embed = preview_message.embeds[0]
+        target_message_link = get_message_link(job.server_id, job.target_channel_id, job.target_message_id)
+        command = f'`{get_prefix(self.bot, preview_message)}ra cancel {job.job_id}`'
+        embed.description = TEXT_CLEANUP_PROGRESS_FORMAT.format(
+            job.job_id, get_message_link_string(target_message_link), job.get_progress_text(), command)
+        await preview_message.edit(embed=embed)
+
+    async def show_cleanup_job_result(self, job, preview_message):
+        embed = preview_message.embeds[0]
+        target_message_link_string = get_message_link_string(
+            get_message_link(job.server_id, job.target_channel_id, job.target_message_id))
         (date_string, time_string) = str(datetime.now())[:-7].split()
-        embed.description = f'The following reaction cleanup for message **{target_message_link_string}** ' \
-                            f'finished successfully on **{date_string}** at **{time_string}**.\n\n'
+        removal_count = len(job.removals)
+
+        if job.status == CLEANUP_JOB_COMPLETED:
+            embed.title += ' [COMPLETED]'
+            embed.description = f'The following reaction cleanup for message **{target_message_link_string}** ' \
+                                f'finished successfully on **{date_string}** at **{time_string}**.\n\n'
+            if job.removed_count < removal_count:
+                embed.description += f'⚠️ \u200B Only **{job.removed_count}** of these **{removal_count}** ' \
+                                     f'reactions could be removed.\n\n'
+        else:
+            embed.title += f' [{job.status.upper()}]'
+            embed.description = f'The following reaction cleanup for message **{target_message_link_string}** ' \
+                                f'was {job.status} on **{date_string}** at **{time_string}**, after ' \
+                                f'**{job.removed_count}** of these **{removal_count}** reactions were removed.\n\n'
         await preview_message.edit(embed=embed)
         await preview_message.clear_reactions()
 
         message_link_string = get_message_link_string(preview_message.jump_url)
-        success_text = f'Completed reaction cleanup based on message **{message_link_string}**.'
-        await preview_message.channel.send(embed=create_basic_embed(success_text, EMOJI_SUCCESS))
+        if job.status == CLEANUP_JOB_COMPLETED:
+            result_embed = create_basic_embed(
+                f'Completed reaction cleanup based on message **{message_link_string}**.', EMOJI_SUCCESS)
+        else:
+            result_embed = create_basic_embed(
+                f'Reaction cleanup job **#{job.job_id}** based on message **{message_link_string}** was {job.status}.',
+                EMOJI_ERROR)
+        await preview_message.channel.send(embed=result_embed)
 
     async def handle_reaction_cleanup_error(self, preview_message, embed):
         embed.title += ' [OUTDATED]'
@@ -270,211 +686,450 @@ class Reactions(commands.Cog):
         error_text = f'Message **{message_link_string}** is outdated! Please re-run {command}.'
         await preview_message.channel.send(embed=create_basic_embed(error_text, EMOJI_ERROR))
 
-    async def handle_reaction_event(self, message, user, emoji, event_type):
-        config = await self.get_config_for_message(message)
-        role = Reactions.get_role_from_config(config, emoji, message.guild)
-
-        if not role:
-            log(f'ERROR: Nonexistent role in {config[KEY_MESSAGE_LINK]}!')
-            await user.send(embed=create_basic_embed('Something went wrong - that role doesn\'t exist!', EMOJI_ERROR))
-            return
+    async def reconcile(self):
+        # Reconciles the roles of everyone who reacted (or un-reacted) while the bot wasn't listening. The messages are
+        # worked through in passes that each cover a limited number of messages per server, so that servers with many
+        # messages don't hold up the others. Each server starts after the last message that was reached before, and
+        # stops once it runs out of requests for this run, so that large servers are covered bit by bit over several
+        # runs (the next one starts when the bot reconnects).
+        await self.configs_loaded.wait()
+        checkpoints = dict(await self.database.fetchall('SELECT server_id, message_id FROM reconcile_checkpoints'))
+        message_ids_by_server = {}
+        for message_id, compiled_config in sorted(self.tracked_messages.items()):
+            message_ids_by_server.setdefault(compiled_config.server_id, []).append(message_id)
+
+        states = []
+        for server_id, message_ids in message_ids_by_server.items():
+            server = self.bot.get_guild(server_id)
+            if server:
+                checkpoint = checkpoints.get(server_id, 0)
+                next_index = next((i for i, message_id in enumerate(message_ids) if message_id > checkpoint), 0)
+                message_ids = message_ids[next_index:] + message_ids[:next_index]
+                removes_roles = self.reconcile_settings.get(server_id, RECONCILE_REMOVES_ROLES_BY_DEFAULT)
+                states.append(ReconcileState(server, message_ids, removes_roles))
+
+        started_at = monotonic()
+        reconciled_count = 0
+        unfinished_states = states
+        while unfinished_states:
+            passes = [self.reconcile_server(state) for state in unfinished_states]
+            reconciled_count += sum(await gather_with_concurrency(RECONCILE_CONCURRENCY, passes))
+            unfinished_states = [state for state in unfinished_states
+                                 if state.remaining_message_ids and (state.requests_left > 0)]
+
+        for state in states:
+            if state.remaining_message_ids:
+                log(f'RECONCILE: Ran out of requests in "{state.server.name}" with {len(state.remaining_message_ids)} '
+                    f'message(s) left, which will be reconciled the next time.')
+            elif state.removes_roles:
+                # Every message has been covered, so anyone who holds a role without a reaction for it has un-reacted.
+                reconciled_count += await self.remove_unbacked_roles(state)
+
+        log(f'RECONCILE: Updated the roles of {reconciled_count} member(s) in {len(states)} server(s) '
+            f'in {monotonic() - started_at:.1f} seconds.')
+
+    async def reconcile_server(self, state):
+        reconciled_count = 0
+        server = state.server
+        for _ in range(RECONCILE_MESSAGES_PER_PASS):
+            if not (state.remaining_message_ids and (state.requests_left > 0)):
+                break
+            message_id = state.remaining_message_ids.pop(0)
+            try:
+                reconciled_count += await self.reconcile_message(state, message_id)
+            except HTTPException as error:
+                log(f'RECONCILE: Failed to reconcile message {message_id}: {error}')
+                config = self.tracked_messages.get(message_id)
+                if config:
+                    # The message's reactions are unknown, so they can't be ruled out for any of its roles.
+                    state.kept_roles.update(config.get_roles(server))
+            await self.database.execute('INSERT INTO reconcile_checkpoints VALUES (?, ?) '
+                                        'ON CONFLICT (server_id) DO UPDATE SET message_id=excluded.message_id',
+                                        (server.id, message_id))
+        return reconciled_count
+
+    async def acquire_reconcile_request(self, state):
+        await self.reconcile_rate_limiter.acquire()
+        state.requests_left -= 1
+
+    async def fetch_reactor_ids(self, state, reaction):
+        # The reactors are fetched one page at a time, so that every request is paid for with the rate limiter.
+        reactor_ids = set()
+        after = None
+        while True:
+            await self.acquire_reconcile_request(state)
+            users = await reaction.users(limit=REACTION_USERS_PAGE_SIZE, after=after).flatten()
+            reactor_ids.update(user.id for user in users if not user.bot)
+            if len(users) < REACTION_USERS_PAGE_SIZE:
+                return reactor_ids
+            after = users[-1]
+
+    async def reconcile_message(self, state, message_id):
+        """ Gives the message's roles to the members who reacted for them, and records what was learned in the state.
+        """
+        server = state.server
+        config = self.tracked_messages.get(message_id)
+        if not config:
+            return 0
+        if not (config.is_reactive and config.allow_cancellation):
+            state.kept_roles.update(config.get_roles(server))
+            if not config.is_reactive:
+                return 0
+
+        channel = server.get_channel(config.channel_id)
+        try:
+            await self.acquire_reconcile_request(state)
+            message = await channel.fetch_message(message_id) if channel else None
+        except NotFound:
+            message = None
+        if not message:
+            state.kept_roles.update(config.get_roles(server))
+            await self.delete_configs_for_deleted_messages(server.id, {message_id})
+            return 0
 
-        async with self.role_lock:
-            if config[KEY_ALLOW_MULTISELECT]:
-                # Simple case - multiselect is allowed, so all choices are independent of each other.
+        # Map each of the menu's roles to the IDs of the members who currently have the matching reaction.
+        reactor_ids = {role: set() for role in config.get_roles(server)}
+        for reaction in message.reactions:
+            role = config.get_role(reaction.emoji, server)
+            if role:
+                reactor_ids[role] = await self.fetch_reactor_ids(state, reaction)
+        for role, user_ids in reactor_ids.items():
+            state.role_reactor_ids.setdefault(role, set()).update(user_ids)
+
+        # Map each member who reacted for a role they don't have to the roles they should be given.
+        roles_to_add = {}
+        for role, user_ids in reactor_ids.items():
+            holder_ids = {member.id for member in role.members}
+            for user_id in user_ids - holder_ids:
+                roles_to_add.setdefault(user_id, set()).add(role)
+
+        reconciled_count = 0
+        for user_id, roles in roles_to_add.items():
+            async with self.get_role_lock(server.id, user_id):
+                member = server.get_member(user_id)
+                if not member:
+                    continue
+                new_roles = set(member.roles) | roles
+                if (not config.allow_multiselect) and len(new_roles & reactor_ids.keys()) > 1:
+                    # It's not clear which of their choices should win, so leave this member alone.
+                    log(f'RECONCILE: Skipping {member.name}#{member.discriminator}, who has more than one of the '
+                        f'roles from single-select message {message_id}.')
+                    continue
+                if new_roles != set(member.roles):
+                    log(f'RECONCILE: Giving {member.name}#{member.discriminator} {len(new_roles - set(member.roles))} '
+                        f'role(s) from message {message_id}.')
+                    await self.acquire_reconcile_request(state)
+                    await member.edit(roles=[role for role in new_roles if not role.is_default()])
+                    reconciled_count += 1
+
+        increment_counter(METRIC_RECONCILED_MEMBERS, reconciled_count)
+        return reconciled_count
+
+    async def remove_unbacked_roles(self, state):
+        """ Takes each role away from the members who hold it without a reaction for it on any of its messages. """
+        server = state.server
+        roles_to_remove = {}
+        for role, reactor_ids in state.role_reactor_ids.items():
+            if role not in state.kept_roles:
+                for member in role.members:
+                    if (member.id not in reactor_ids) and (not member.bot):
+                        roles_to_remove.setdefault(member.id, set()).add(role)
+
+        reconciled_count = 0
+        for user_id, roles in roles_to_remove.items():
+            async with self.get_role_lock(server.id, user_id):
+                member = server.get_member(user_id)
+                if not member:
+                    continue
+                new_roles = set(member.roles) - roles
+                if new_roles != set(member.roles):
+                    log(f'RECONCILE: Taking {len(roles)} role(s) away from {member.name}#{member.discriminator}, '
+                        f'who no longer reacts for them.')
+                    await self.acquire_reconcile_request(state)
+                    await member.edit(roles=[role for role in new_roles if not role.is_default()])
+                    reconciled_count += 1
+
+        increment_counter(METRIC_RECONCILED_MEMBERS, reconciled_count)
+        return reconciled_count
+
+    def queue_reaction_event(self, channel, message_id, user, emoji, event_type):
+        # Events from the same member on the same message are collected for a short window and then handled together,
+        # so that a burst of clicks (and the removals they cause) results in a single role edit and a single message.
+        key = (message_id, user.id)
+        if key not in self.pending_reaction_events:
+            self.pending_reaction_events[key] = []
+            self.bot.loop.call_later(REACTION_COALESCE_SECONDS, self.enqueue_reaction_events, channel, message_id, user)
+        self.pending_reaction_events[key].append((emoji, event_type))
+
+    def enqueue_reaction_events(self, channel, message_id, user):
+        # Each server's events are handled by its own small, fixed set of workers (which also share a global limit), so
+        # a flood of reactions in one server can neither starve the other servers nor run into the global rate limit.
+        # While the events wait in the queue, any new events from the same member are still added to the batch.
+        if not (channel and self.bot.get_guild(channel.guild.id)):
+            self.pending_reaction_events.pop((message_id, user.id), None)
+            return  # The channel was deleted, or the bot left the server, while the events were being collected.
+
+        work_queue = self.reaction_work_queues.get(channel.guild.id)
+        if not work_queue:
+            work_queue = WorkQueue(self.bot.loop, self.handle_reaction_events, REACTION_WORKERS_PER_SERVER,
+                                   REACTION_QUEUE_SIZE, self.reaction_worker_semaphore)
+            self.reaction_work_queues[channel.guild.id] = work_queue
+        if not work_queue.put((channel, message_id, user)):
+            increment_counter(METRIC_QUEUE_OVERFLOWS)
+        self.update_queue_depth_gauge()
+
+    def update_queue_depth_gauge(self):
+        set_gauge(METRIC_QUEUE_DEPTH, sum(len(work_queue) for work_queue in self.reaction_work_queues.values()))
+
+    async def handle_reaction_events(self, channel, message_id, user):
+        events = self.pending_reaction_events.pop((message_id, user.id))
+        increment_counter(METRIC_COALESCED_EVENTS, len(events) - 1)
+        self.update_queue_depth_gauge()
+
+        config = self.get_compiled_config(channel.guild.id, channel.id, message_id)
+        if not config:
+            return  # The config was deleted while the events were being collected.
+
+        role_lock = self.get_role_lock(channel.guild.id, user.id)
+        wait_start = monotonic()
+        async with role_lock:
+            record_timing(METRIC_ROLE_LOCK_WAIT, monotonic() - wait_start)
+            member = channel.guild.get_member(user.id) or user  # Get a fresh copy, in case the roles have changed.
+            role_update = RoleUpdate(member)
+
+            for emoji, event_type in events:
                 if event_type == REACTION_ADD:
-                    await Reactions.handle_single_role_addition(user, role, emoji, config)
-                else:
-                    await Reactions.handle_single_role_removal(user, role, emoji, config)
-            elif (event_type == REACTION_ADD) and config[KEY_ALLOW_CANCELLATION]:
-                # Before adding the role, remove all other role options and reactions available in the message.
-                # Removing the reactions like this will trigger a new REACTION_REMOVE event.
-                for reaction_option in message.reactions:
-                    if str(reaction_option.emoji) != str(emoji):
-                        role_option = Reactions.get_role_from_config(config, reaction_option.emoji, message.guild)
-                        if role_option in user.roles:
-                            log(f'Removing role "{role_option.name}" from {user.name}#{user.discriminator}.', indent=1)
-                            await user.remove_roles(role_option)
-                            log(f'Removing {user.name}#{user.discriminator}\'s "{reaction_option.emoji}" '
-                                f'reaction from message {message.id}.', indent=1)
-                            await reaction_option.remove(user)
-                await Reactions.handle_single_role_addition(user, role, emoji, config)
-            elif (event_type == REACTION_ADD) and (not config[KEY_ALLOW_CANCELLATION]):
-                # Only add the role if the user has not already selected a role from the message.
-                # Also remove the current reaction if it's invalid, which will trigger a new REACTION_REMOVE event.
-                # TODO: Optimize this! We probably don't need to loop through twice.
-                role_reaction_map = {}
-                for reaction_option in message.reactions:
-                    role_option = Reactions.get_role_from_config(config, reaction_option.emoji, message.guild)
-                    if role_option:
-                        role_reaction_map[role_option] = reaction_option
-                already_selected_role = None
-                for role_option, reaction_option in role_reaction_map.items():
-                    if role_option in user.roles:
-                        already_selected_role = role_option
-                    if reaction_option.emoji == emoji:
-                        current_reaction = reaction_option
-                if already_selected_role and (role_reaction_map[already_selected_role].emoji != current_reaction.emoji):
-                    log(f'{user.name}#{user.discriminator} has already selected the "{already_selected_role.name}" '
-                        f'role, and switching is disabled.', indent=1)
-                    await current_reaction.remove(user)
-                    await user.send(embed=create_basic_embed(
-                        TEXT_ALREADY_SELECTED_FORMAT.format(config[KEY_MESSAGE_LINK], already_selected_role.name)))
+                    role_update.reacted_emoji.add(emoji)
                 else:
-                    await Reactions.handle_single_role_addition(user, role, emoji, config)
-            elif event_type == REACTION_REMOVE:
-                # This case might be triggered when the bot auto-removes reactions in the cases above or during cleanup.
-                await Reactions.handle_single_role_removal(user, role, emoji, config)
+                    role_update.reacted_emoji.discard(emoji)
+                role = config.get_role(emoji, channel.guild)
+                if not role:
+                    log(f'ERROR: Nonexistent role in {config.message_link}!')
+                    role_update.notices.append(
+                        FORMAT_EMOJI_TEXT.format(EMOJI_ERROR, 'Something went wrong - that role doesn\'t exist!'))
+                    continue
+                Reactions.plan_reaction_event(role_update, channel.guild, role, emoji, event_type, config)
+
+            await self.apply_role_update(role_update, channel, message_id, config)
+
+    def expect_reaction_removal(self, message_id, user_id, emoji):
+        # Every deadline is the same amount of time after it was set, so the dict stays sorted by deadline as long as
+        # re-added keys are moved to the end. That means expired entries can always be pruned from the front.
+        now = monotonic()
+        while self.expected_reaction_removals and next(iter(self.expected_reaction_removals.values())) < now:
+            del self.expected_reaction_removals[next(iter(self.expected_reaction_removals))]
+        key = (message_id, user_id, str(emoji))
+        self.expected_reaction_removals.pop(key, None)
+        self.expected_reaction_removals[key] = now + EXPECTED_REMOVAL_TIMEOUT_SECONDS
+
+    def forget_reaction_removal(self, message_id, user_id, emoji):
+        self.expected_reaction_removals.pop((message_id, user_id, str(emoji)), None)
+
+    def is_expected_reaction_removal(self, message_id, user_id, emoji):
+        deadline = self.expected_reaction_removals.pop((message_id, user_id, emoji), None)
+        return (deadline is not None) and (deadline >= monotonic())
+
+    def get_role_lock(self, server_id, user_id):
+        # Role changes only need to be serialized per member, so unrelated members (and servers) never wait on each
+        # other. Locks are only weakly referenced here, so each one is discarded once nobody is holding or awaiting it.
+        key = (server_id, user_id)
+        role_lock = self.role_locks.get(key)
+        if role_lock is None:
+            role_lock = asyncio.Lock()
+            self.role_locks[key] = role_lock
+        return role_lock
+
+    @staticmethod
+    def plan_reaction_event(role_update, server, role, emoji, event_type, config):
+        # The single-select modes work from the config's role options rather than the message's reactions, so that the
+        # message never has to be fetched. The member's whole set of roles is then applied in one edit.
+        user = role_update.member
+        if config.allow_multiselect:
+            # Simple case - multiselect is allowed, so all choices are independent of each other.
+            if event_type == REACTION_ADD:
+                Reactions.plan_single_role_addition(role_update, role, emoji, config)
+            else:
+                Reactions.plan_single_role_removal(role_update, role, config)
+        elif (event_type == REACTION_ADD) and config.allow_cancellation:
+            # Before adding the role, remove all other role options (and their reactions) available in the message.
+            for reaction_option, role_id in config.menu:
+                if reaction_option != emoji:
+                    role_option = server.get_role(role_id)
+                    if role_option in role_update.roles:
+                        log(f'Removing role "{role_option.name}" from {user.name}#{user.discriminator}.', indent=1)
+                        role_update.roles.discard(role_option)
+                        role_update.reactions_to_remove.append(reaction_option)
+            Reactions.plan_single_role_addition(role_update, role, emoji, config)
+        elif event_type == REACTION_ADD:
+            # Only add the role if the user has not already selected a role from the message.
+            # Also remove the current reaction if it's invalid.
+            already_selected_role = None
+            for reaction_option, role_id in config.menu:
+                role_option = server.get_role(role_id)
+                if role_option and (role_option in role_update.roles) and (reaction_option != emoji):
+                    already_selected_role = role_option
+            if already_selected_role:
+                log(f'{user.name}#{user.discriminator} has already selected the "{already_selected_role.name}" '
+                    f'role, and switching is disabled.', indent=1)
+                role_update.reactions_to_remove.append(emoji)
+                role_update.notices.append(
+                    TEXT_ALREADY_SELECTED_FORMAT.format(config.message_link, already_selected_role.name))
             else:
-                # This should never happen, but log it just in case it does.
-                log(f'ERROR: Unexpected event type or message config!')
-                log(f'SOURCE: {user.name}#{user.discriminator} {"" if event_type == REACTION_ADD else "un-"}'
-                    f'reacted with "{emoji}".', indent=1)
-                log(f'CONFIG: {config}', indent=1)
-                await user.send(
-                    embed=create_basic_embed('Something went wrong - that\'s an unexpected event type!', EMOJI_ERROR))
-
-    # This method assumes that self.role_lock is already held by the caller.
+                Reactions.plan_single_role_addition(role_update, role, emoji, config)
+        else:
+            Reactions.plan_single_role_removal(role_update, role, config)
+
     @staticmethod
-    async def handle_single_role_addition(user, role, emoji, config):
-        message_link = config[KEY_MESSAGE_LINK]
-        if role in user.roles:
+    def plan_single_role_addition(role_update, role, emoji, config):
+        user = role_update.member
+        if role in role_update.roles:
             log(f'{user.name}#{user.discriminator} already has the role "{role.name}".', indent=1)
-            if config[KEY_ALLOW_CANCELLATION]:
-                await user.send(embed=create_basic_embed(
-                    TEXT_ALREADY_REACTED_FORMAT.format(role.name, emoji, message_link)))
+            if config.allow_cancellation:
+                role_update.notices.append(TEXT_ALREADY_REACTED_FORMAT.format(role.name, emoji, config.message_link))
             else:
-                await user.send(embed=create_basic_embed(TEXT_REDUNDANT_REACTION_FORMAT.format(role.name)))
+                role_update.notices.append(TEXT_REDUNDANT_REACTION_FORMAT.format(role.name))
         else:
             log(f'Adding role "{role.name}" to {user.name}#{user.discriminator}.', indent=1)
-            await user.add_roles(role)
-            if config[KEY_CONFIRMATION_TYPE] == CONFIRMATION_TYPE_PUBLIC:
-                confirmation_channel = role.guild.get_channel(config[KEY_CONFIRMATION_CHANNEL_ID])
-                await confirmation_channel.send(embed=create_basic_embed(
-                    TEXT_CONFIRMATION_PUBLIC_FORMAT.format(emoji, user.mention, role.mention, message_link)))
-            elif config[KEY_CONFIRMATION_TYPE] == CONFIRMATION_TYPE_PRIVATE:
-                await user.send(embed=create_basic_embed(
-                    TEXT_CONFIRMATION_PRIVATE_FORMAT.format(emoji, role.name, message_link)))
-
-    # This method assumes that self.role_lock is already held by the caller.
+            role_update.roles.add(role)
+
     @staticmethod
-    async def handle_single_role_removal(user, role, emoji, config):
-        if (hasattr(user, 'roles')) and (role in user.roles):
-            if config[KEY_ALLOW_CANCELLATION]:
-                message_link = config[KEY_MESSAGE_LINK]
+    def plan_single_role_removal(role_update, role, config):
+        user = role_update.member
+        if role in role_update.roles:
+            if config.allow_cancellation:
                 log(f'Removing role "{role.name}" from {user.name}#{user.discriminator}.', indent=1)
-                await user.remove_roles(role)
-                if config[KEY_CONFIRMATION_TYPE] == CONFIRMATION_TYPE_PUBLIC:
-                    confirmation_channel = role.guild.get_channel(config[KEY_CONFIRMATION_CHANNEL_ID])
-                    await confirmation_channel.send(embed=create_basic_embed(
-                        TEXT_CANCELLATION_PUBLIC_FORMAT.format(emoji, user.mention, role.mention, message_link)))
-                elif config[KEY_CONFIRMATION_TYPE] == CONFIRMATION_TYPE_PRIVATE:
-                    await user.send(embed=create_basic_embed(
-                        TEXT_CANCELLATION_PRIVATE_FORMAT.format(emoji, role.name, message_link)))
+                role_update.roles.discard(role)
             else:
                 log(f'Cannot remove role "{role.name}" from {user.name}#{user.discriminator} '
                     f'because cancellations are disabled.', indent=1)
-                await user.send(embed=create_basic_embed(TEXT_CANCELLATIONS_DISABLED_FORMAT.format(role.name)))
+                role_update.notices.append(TEXT_CANCELLATIONS_DISABLED_FORMAT.format(role.name))
         else:
             log(f'{user.name}#{user.discriminator} already doesn\'t have the role "{role.name}".', indent=1)
 
-    # This method assumes that self.cache_lock is already held by the caller.
-    def has_fresh_data_for_server(self, server_id):
-        if server_id not in self.cache:
-            return False
-        else:
-            cache_timestamp = self.cache[server_id][CACHE_KEY_TIMESTAMP]
-            return (datetime.now() - cache_timestamp).seconds < CACHE_TTL_SECONDS
-
-    async def get_reaction_roles_for_server(self, server_id):
-        async with self.cache_lock:
-            if self.has_fresh_data_for_server(server_id):
-                return self.cache[server_id][CACHE_KEY_DATA]
-
-            data_from_db = []
-            with sqlite3.connect(self.db) as connection:
-                c = connection.cursor()
-                query = 'SELECT message_id, channel_id, reaction_role_menu FROM reactions WHERE server_id=?'
-                for row in c.execute(query, (server_id,)):
-                    data_from_db.append({
-                        DATA_KEY_MESSAGE_ID: row[0],
-                        DATA_KEY_CHANNEL_ID: row[1],
-                        DATA_KEY_REACTION_ROLES: [item[0] for item in json.loads(row[2])]
-                    })
-                c.close()
-
-            self.cache[server_id] = {
-                CACHE_KEY_DATA: data_from_db,
-                CACHE_KEY_TIMESTAMP: datetime.now()
-            }
-            return data_from_db
-
-    async def get_config_for_message(self, message):
-        async with self.cache_lock:
-            server_id = message.guild.id
-            if self.has_fresh_data_for_server(server_id) and message.id in self.cache[server_id]:
-                return self.cache[server_id][message.id]
-
-            config = {}
-            with sqlite3.connect(self.db) as connection:
-                c = connection.cursor()
-                c.execute('SELECT * FROM reactions WHERE message_id=?', (message.id,))
-                row = c.fetchone()
-                if row and row[1] == message.channel.id and row[2] == server_id:
-                    config[KEY_MESSAGE_LINK] = message.jump_url
-                    config[KEY_IS_REACTIVE] = bool(row[3])
-                    config[KEY_ALLOW_MULTISELECT] = bool(row[4])
-                    config[KEY_ALLOW_CANCELLATION] = bool(row[5])
-                    config[KEY_CONFIRMATION_TYPE] = row[6]
-                    config[KEY_CONFIRMATION_CHANNEL_ID] = row[7]
-                    config[KEY_REACTION_ROLE_MENU] = json.loads(row[8])
-                c.close()
-
-            if server_id in self.cache:
-                self.cache[server_id][message.id] = config
-            return config
+    # This method assumes that the member's role lock is already held by the caller.
+    async def apply_role_update(self, role_update, channel, message_id, config):
+        user = role_update.member
+        gained_roles = role_update.roles - role_update.initial_roles
+        lost_roles = role_update.initial_roles - role_update.roles
+
+        if gained_roles or lost_roles:
+            # However many roles changed, the member's final set of roles is applied in a single API call.
+            await user.edit(roles=[role for role in role_update.roles if not role.is_default()])
+
+        message = channel.get_partial_message(message_id)
+        for emoji in role_update.reactions_to_remove:
+            log(f'Removing {user.name}#{user.discriminator}\'s "{emoji}" reaction from message {message_id}.', indent=1)
+            # Removing a reaction that doesn't exist succeeds without an event, so an expectation for it would swallow
+            # the member's next real removal. The event for an unknown reaction is handled normally instead, which is
+            # harmless since the role has already been removed.
+            if emoji in role_update.reacted_emoji:
+                self.expect_reaction_removal(message_id, user.id, emoji)
+            try:
+                await message.remove_reaction(emoji, user)
+            except HTTPException:
+                self.forget_reaction_removal(message_id, user.id, emoji)
+                raise
+
+        # Build at most one confirmation message for all of the role changes, in the order of the reaction/role menu.
+        message_link = config.message_link
+        changed_roles = {role.id: role for role in gained_roles | lost_roles}
+        confirmations = []
+        for reaction, role_id in config.menu:
+            role = changed_roles.get(role_id)
+            is_gained = role in gained_roles
+            if not role:
+                continue
+            elif config.confirmation_type == CONFIRMATION_TYPE_PUBLIC:
+                text_format = TEXT_CONFIRMATION_PUBLIC_FORMAT if is_gained else TEXT_CANCELLATION_PUBLIC_FORMAT
+                confirmations.append(text_format.format(reaction, user.mention, role.mention, message_link))
+            elif config.confirmation_type == CONFIRMATION_TYPE_PRIVATE:
+                text_format = TEXT_CONFIRMATION_PRIVATE_FORMAT if is_gained else TEXT_CANCELLATION_PRIVATE_FORMAT
+                confirmations.append(text_format.format(reaction, role.name, message_link))
+
+        if confirmations and (config.confirmation_type == CONFIRMATION_TYPE_PUBLIC):
+            confirmation_channel = channel.guild.get_channel(config.confirmation_channel_id)
+            await confirmation_channel.send(embed=create_basic_embed('\n'.join(confirmations)))
+        elif confirmations:
+            role_update.notices.extend(confirmations)
+
+        if role_update.notices:
+            queue_dm(user, embed_text='\n'.join(role_update.notices))
+
+    def get_compiled_configs_for_server(self, server_id):
+        return [compiled_config for message_id, compiled_config in sorted(self.tracked_messages.items())
+                if compiled_config.server_id == server_id]
+
+    def get_config_for_message(self, message):
+        return self.get_config(message.guild.id, message.channel.id, message.id)
+
+    def get_config(self, server_id, channel_id, message_id):
+        # Every config is loaded at startup and kept current by the methods below, so this never reads the database.
+        return self.configs[message_id] if self.get_compiled_config(server_id, channel_id, message_id) else {}
+
+    def get_compiled_config(self, server_id, channel_id, message_id):
+        compiled_config = self.tracked_messages.get(message_id)
+        if compiled_config and (compiled_config.channel_id == channel_id) and (compiled_config.server_id == server_id):
+            return compiled_config
+
+    # This method assumes that self.config_lock is already held by the caller (or that it's called during startup).
+    def cache_config(self, message_id, channel_id, server_id, config):
+        config = config.copy()
+        config[KEY_MESSAGE_LINK] = get_message_link(server_id, channel_id, message_id)
+        config[KEY_REACTION_ROLE_MENU] = [[reaction, role] for reaction, role in config[KEY_REACTION_ROLE_MENU]]
+        self.configs[message_id] = config
+        self.tracked_messages[message_id] = CompiledConfig.compile(message_id, channel_id, server_id, config)
 
     async def save_config_for_message(self, message, config):
-        async with self.cache_lock:
+        async with self.config_lock:
             server_id = message.guild.id
-            with sqlite3.connect(self.db) as connection:
-                c = connection.cursor()
-                c.execute('SELECT * FROM reactions WHERE message_id=?', (message.id,))
-                row = c.fetchone()
-                if row and row[1] == message.channel.id and row[2] == server_id:
-                    c.execute('UPDATE reactions '
-                              'SET is_reactive=?,'
-                              '    allow_multiselect=?,'
-                              '    allow_cancellation=?,'
-                              '    confirmation_type=?,'
-                              '    confirmation_channel_id=?,'
-                              '    reaction_role_menu=? '
-                              'WHERE message_id=?',
-                              (config[KEY_IS_REACTIVE], config[KEY_ALLOW_MULTISELECT], config[KEY_ALLOW_CANCELLATION],
-                               config[KEY_CONFIRMATION_TYPE], config[KEY_CONFIRMATION_CHANNEL_ID],
-                               json.dumps(config[KEY_REACTION_ROLE_MENU]),
-                               message.id))
-                else:
-                    c.execute('INSERT INTO reactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                              (message.id, message.channel.id, server_id,
-                               config[KEY_IS_REACTIVE], config[KEY_ALLOW_MULTISELECT], config[KEY_ALLOW_CANCELLATION],
-                               config[KEY_CONFIRMATION_TYPE], config[KEY_CONFIRMATION_CHANNEL_ID],
-                               json.dumps(config[KEY_REACTION_ROLE_MENU])))
-                c.close()
-                self.cache.pop(server_id, None)  # Invalidate the cache because changes were made.
+            async with self.database.transaction() as connection:
+                await connection.execute('INSERT INTO reactions VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+                                         'ON CONFLICT (message_id) DO UPDATE SET '
+                                         '    channel_id=excluded.channel_id,'
+                                         '    server_id=excluded.server_id,'
+                                         '    is_reactive=excluded.is_reactive,'
+                                         '    allow_multiselect=excluded.allow_multiselect,'
+                                         '    allow_cancellation=excluded.allow_cancellation,'
+                                         '    confirmation_type=excluded.confirmation_type,'
+                                         '    confirmation_channel_id=excluded.confirmation_channel_id',
+                                         (message.id, message.channel.id, server_id,
+                                          config[KEY_IS_REACTIVE], config[KEY_ALLOW_MULTISELECT],
+                                          config[KEY_ALLOW_CANCELLATION], config[KEY_CONFIRMATION_TYPE],
+                                          config[KEY_CONFIRMATION_CHANNEL_ID]))
+                await connection.execute('DELETE FROM reaction_roles WHERE message_id=?', (message.id,))
+                await connection.executemany(
+                    'INSERT OR IGNORE INTO reaction_roles VALUES (?, ?, ?, ?)',
+                    [(message.id, str(reaction), Reactions.get_role_id_from_role_str(role_str), position)
+                     for position, (reaction, role_str) in enumerate(config[KEY_REACTION_ROLE_MENU])])
+            self.cache_config(message.id, message.channel.id, server_id, config)
 
     async def delete_config_for_message(self, server_id, message_id):
-        async with self.cache_lock:
-            message_deleted = False
-            with sqlite3.connect(self.db) as connection:
-                c = connection.cursor()
-                c.execute('SELECT * FROM reactions WHERE message_id=? AND server_id=?', (message_id, server_id))
-                if c.fetchone():
-                    c.execute('DELETE FROM reactions WHERE message_id=? AND server_id=?', (message_id, server_id))
-                    self.cache.pop(server_id, None)  # Invalidate the cache because changes were made.
-                    message_deleted = True
-                c.close()
-            return message_deleted
+        async with self.config_lock:
+            async with self.database.transaction() as connection:
+                async with connection.execute(
+                        'DELETE FROM reactions WHERE message_id=? AND server_id=?', (message_id, server_id)) as cursor:
+                    deleted_rows = cursor.rowcount
+                if deleted_rows:
+                    await connection.execute('DELETE FROM reaction_roles WHERE message_id=?', (message_id,))
+            if deleted_rows:
+                self.configs.pop(message_id, None)
+                self.tracked_messages.pop(message_id, None)
+            return deleted_rows > 0
+
+    @staticmethod
+    def get_config_from_row(row, reaction_role_menu):
+        return {
+            KEY_IS_REACTIVE: bool(row[3]),
+            KEY_ALLOW_MULTISELECT: bool(row[4]),
+            KEY_ALLOW_CANCELLATION: bool(row[5]),
+            KEY_CONFIRMATION_TYPE: row[6],
+            KEY_CONFIRMATION_CHANNEL_ID: row[7],
+            KEY_REACTION_ROLE_MENU: reaction_role_menu
+        }
+
+    @staticmethod
+    def get_cleanup_job_from_row(row):
+        return CleanupJob(row[0], row[1], row[2], row[3], row[4], row[5], json.loads(row[6]), row[7], row[8], row[9])
 
     @staticmethod
     def get_available_reactions(config):
@@ -487,14 +1142,12 @@ class Reactions(commands.Cog):
                 return role
 
     @staticmethod
-    def get_role_from_role_str(role_str, server):
-        return server.get_role(int(role_str[3:-1]))
+    def get_role_id_from_role_str(role_str):
+        return int(role_str[3:-1])  # Role strings are role mentions, which look like: <@&ROLE_ID>
 
     @staticmethod
-    def get_role_from_config(config, emoji, server):
-        role_str = Reactions.get_role_str_from_config(config, emoji)
-        if role_str:
-            return Reactions.get_role_from_role_str(role_str, server)
+    def get_role_str_from_role_id(role_id):
+        return f'<@&{role_id}>'
 
     @staticmethod
     def get_display_embed(bot, config):
@@ -562,30 +1215,71 @@ class Reactions(commands.Cog):
         else:
             await message.clear_reactions()
 
-    async def list(self, ctx):
-        server_info = await self.get_reaction_roles_for_server(ctx.guild.id)
-        table_rows = []
+    async def list(self, ctx, page_str='1'):
+        # Everything in the list comes from the tracked message IDs, so it never needs to fetch any of the messages.
+        compiled_configs = self.get_compiled_configs_for_server(ctx.guild.id)
+        page_count = max(1, ceil(len(compiled_configs) / LIST_PAGE_SIZE))
+        page = int(page_str) if page_str.isdigit() else 0
+        if not 1 <= page <= page_count:
+            embed_text = f'Please choose a page between **1** and **{page_count}**.'
+            await ctx.send(embed=create_basic_embed(embed_text, EMOJI_ERROR))
+            return
 
-        for message_info in server_info:
-            try:
-                channel = ctx.guild.get_channel(message_info[DATA_KEY_CHANNEL_ID])
-                message = await channel.fetch_message(message_info[DATA_KEY_MESSAGE_ID])
-                message_link_string = f'**{get_message_link_string(message.jump_url)}**'
-                available_reactions = ' \u200B '.join(message_info[DATA_KEY_REACTION_ROLES])
-                table_rows.append((channel.mention, message_link_string, available_reactions))
-            except (AttributeError, HTTPException):
-                await self.delete_config_for_message(ctx.guild.id, message_info[DATA_KEY_MESSAGE_ID])
+        table_rows = []
+        for compiled_config in compiled_configs[(page - 1) * LIST_PAGE_SIZE:page * LIST_PAGE_SIZE]:
+            message_link_string = f'**{get_message_link_string(compiled_config.message_link)}**'
+            available_reactions = ' \u200B '.join(emoji for emoji, role_id in compiled_config.menu)
+            table_rows.append((f'<#{compiled_config.channel_id}>', message_link_string, available_reactions))
 
         title = f'Reaction/Role Messages in "{ctx.guild.name}"'
+        description = ''
+        if page_count > 1:
+            command = f'`{get_prefix(self.bot, ctx.message)}ra list [page]`'
+            description = f'** **\nShowing page **{page}** of **{page_count}** ({len(compiled_configs)} messages). ' \
+                          f'Use {command} to see the other pages.'
         headers = ('Channel', 'Message', 'Available Reactions')
-        embed = create_table_embed(title, headers, table_rows, mark_rows=False)
+        embed = create_table_embed(title, headers, table_rows, description=description, mark_rows=False)
+        await ctx.send(embed=embed)
+
+    async def validate_list(self, ctx):
+        compiled_configs = self.get_compiled_configs_for_server(ctx.guild.id)
+
+        # Returns a (problem_text, is_gone) tuple, or None if the message is fine.
+        async def validate_compiled_config(compiled_config):
+            channel = ctx.guild.get_channel(compiled_config.channel_id)
+            try:
+                if channel:
+                    await channel.fetch_message(compiled_config.message_id)
+                    return None
+                return 'Channel no longer exists.', True
+            except NotFound:
+                return 'Message no longer exists.', True
+            except HTTPException as error:
+                return f'Couldn\'t be checked (error {error.status}).', False
+
+        async with ctx.channel.typing():
+            results = await gather_with_concurrency(
+                LIST_VALIDATE_CONCURRENCY, [validate_compiled_config(config) for config in compiled_configs])
+
+        table_rows = []
+        for compiled_config, result in zip(compiled_configs, results):
+            if result:
+                (problem_text, is_gone) = result
+                table_rows.append((f'**{get_message_link_string(compiled_config.message_link)}**', problem_text))
+                if is_gone:
+                    await self.delete_config_for_message(ctx.guild.id, compiled_config.message_id)
+
+        title = f'Reaction/Role Message Validation in "{ctx.guild.name}"'
+        description = f'** **\nChecked **{len(compiled_configs)}** configured message(s). The configs for ' \
+                      f'messages that no longer exist have been deleted.'
+        embed = create_table_embed(title, ('Message', 'Problem'), table_rows, description=description, mark_rows=False)
         await ctx.send(embed=embed)
 
     async def config(self, ctx, message_link):
         bot_member = ctx.guild.get_member(self.bot.user.id)
         message = await Reactions.validate_message(ctx, message_link, bot_member)
         if message:
-            config = await self.get_config_for_message(message)
+            config = self.get_config_for_message(message)
             if not config:
                 config = {
                     KEY_MESSAGE_LINK: message_link,
@@ -607,7 +1301,7 @@ class Reactions(commands.Cog):
         dst_message = await Reactions.validate_message(ctx, dst_message_link, bot_member)
 
         if src_message and dst_message:
-            src_config = await self.get_config_for_message(src_message)
+            src_config = self.get_config_for_message(src_message)
             await self.save_config_for_message(dst_message, src_config)
             await Reactions.ensure_relevant_reactions(dst_message, src_config)
 
@@ -639,16 +1333,22 @@ class Reactions(commands.Cog):
             if len(ctx.message.channel_mentions) == 1:
                 channel = ctx.message.channel_mentions[0]
                 if await Reactions.validate_channel(ctx, channel, bot_member):
-                    message_history = await channel.history(limit=BULK_CLEANUP_MESSAGE_LIMIT).flatten()
-                    for message_for_cleanup in reversed(message_history):
-                        await self.cleanup_message(ctx, message_for_cleanup)
+                    messages_for_cleanup = list(reversed(
+                        await channel.history(limit=BULK_CLEANUP_MESSAGE_LIMIT).flatten()))
+                    # Scan the messages concurrently, but still post the results in the order of the messages.
+                    scan_results = await gather_with_concurrency(
+                        CLEANUP_FETCH_CONCURRENCY,
+                        [self.get_reactions_for_cleanup(message) for message in messages_for_cleanup])
+                    for message_for_cleanup, (rows, unused_ids) in zip(messages_for_cleanup, scan_results):
+                        await self.cleanup_message(ctx, message_for_cleanup, rows)
             else:
                 message_for_cleanup = await Reactions.validate_message(ctx, message_link, bot_member)
                 await self.cleanup_message(ctx, message_for_cleanup)
 
-    async def cleanup_message(self, ctx, message):
+    async def cleanup_message(self, ctx, message, rows=None):
         if message:
-            (rows, unused_ids) = await self.get_reactions_for_cleanup(message)
+            if rows is None:
+                (rows, unused_ids) = await self.get_reactions_for_cleanup(message)
             if rows:
                 link_string = get_message_link_string(message.jump_url)
                 description = f'** **\nReact to this message with \u200B {EMOJI_SUCCESS} \u200B to remove the ' \
@@ -656,33 +1356,86 @@ class Reactions(commands.Cog):
                               f'⚠️ \u200B **WARNING:** \u200B This action is irreversible.'
                 headers = ('Reaction', 'User', 'Reason')
                 embed = create_table_embed(TITLE_CLEANUP, headers, rows, description=description, mark_rows=False)
-                await ctx.send(embed=embed)
+                preview_message = await ctx.send(embed=embed)
+                self.cleanup_preview_message_ids.add(preview_message.id)
             else:
                 message_link_string = get_message_link_string(message.jump_url)
                 embed_text = f'Message **{message_link_string}** has no applicable reactions to clean up.'
                 await ctx.send(embed=create_basic_embed(embed_text, EMOJI_WARNING))
 
+    async def jobs(self, ctx):
+        rows = await self.database.fetchall('SELECT * FROM cleanup_jobs WHERE server_id=? ORDER BY job_id DESC LIMIT ?',
+                                            (ctx.guild.id, CLEANUP_JOBS_LIST_LIMIT))
+        table_rows = []
+        for row in rows:
+            job = self.cleanup_jobs.get(row[0]) or Reactions.get_cleanup_job_from_row(row)
+            message_link = get_message_link(job.server_id, job.target_channel_id, job.target_message_id)
+            table_rows.append((f'**#{job.job_id}**', f'**{get_message_link_string(message_link)}**',
+                               f'{job.status.capitalize()}: {job.get_progress_text()}'))
+
+        title = f'Reaction Cleanup Jobs in "{ctx.guild.name}"'
+        headers = ('Job', 'Message', 'Progress')
+        embed = create_table_embed(title, headers, table_rows, mark_rows=False)
+        await ctx.send(embed=embed)
+
+    async def cancel(self, ctx, job_id_str):
+        job = self.cleanup_jobs.get(int(job_id_str)) if job_id_str.isdigit() else None
+        if job and (job.server_id == ctx.guild.id) and (job.status == CLEANUP_JOB_RUNNING):
+            job.status = CLEANUP_JOB_CANCELLED  # The job stops (and reports its result) at its next checkpoint.
+            embed_text = f'Canceled reaction cleanup job **#{job.job_id}** at {job.get_progress_text()} reactions.'
+            await ctx.send(embed=create_basic_embed(embed_text, EMOJI_SUCCESS))
+        else:
+            embed_text = f'There is no reaction cleanup job **#{job_id_str}** in progress on this server.'
+            await ctx.send(embed=create_basic_embed(embed_text, EMOJI_ERROR))
+
+    async def set_reconcile_removals(self, ctx, setting=None):
+        if setting:
+            removes_roles = (setting == 'on')
+            await self.database.execute('INSERT INTO reconcile_settings VALUES (?, ?) '
+                                        'ON CONFLICT (server_id) DO UPDATE SET removes_roles=excluded.removes_roles',
+                                        (ctx.guild.id, removes_roles))
+            self.reconcile_settings[ctx.guild.id] = removes_roles
+        else:
+            removes_roles = self.reconcile_settings.get(ctx.guild.id, RECONCILE_REMOVES_ROLES_BY_DEFAULT)
+
+        if removes_roles:
+            embed_text = 'When I reconnect, I\'ll take roles away from members who removed their reaction in the ' \
+                         'meantime (as long as every menu with that role allows it to be removed).'
+        else:
+            embed_text = 'When I reconnect, I\'ll only give out roles for reactions that were added in the meantime, ' \
+                         'and never take any roles away.'
+        await ctx.send(embed=create_basic_embed(embed_text, EMOJI_SUCCESS if setting else '🔁'))
+
     async def get_reactions_for_cleanup(self, message):
         reactions_for_cleanup = []
         user_ids = {}
-        config = await self.get_config_for_message(message)
+        config = self.get_compiled_config(message.guild.id, message.channel.id, message.id)
+        if not config:
+            return reactions_for_cleanup, user_ids
+
+        reaction_roles = []
         for reaction in message.reactions:
-            try:
-                role = Reactions.get_role_from_config(config, reaction.emoji, message.guild)
-            except KeyError:
-                return
-            users = await reaction.users().flatten()
+            role = config.get_role(reaction.emoji, message.guild)
+            if role:
+                reaction_roles.append((reaction, role))
+
+        # Fetch the users for several reactions at the same time, rather than waiting for each one in turn.
+        reaction_users = await gather_with_concurrency(
+            CLEANUP_FETCH_CONCURRENCY, [reaction.users().flatten() for reaction, role in reaction_roles])
+
+        for (reaction, role), users in zip(reaction_roles, reaction_users):
             for user in users:
                 if not user.bot:
-                    if message.guild not in user.mutual_guilds:
+                    member = message.guild.get_member(user.id)  # Unlike user.mutual_guilds, this is a single lookup.
+                    if not member:
                         user_text = f'{user.name}#{user.discriminator}'
                         reason_text = f'No longer a member of **{message.guild.name}**.'
                         reactions_for_cleanup.append((reaction, user_text, reason_text))
                         user_ids[user_text] = user.id
-                    elif role not in user.roles:
+                    elif role not in member.roles:
                         reason_text = f'Does not have the {role.mention} role.'
-                        reactions_for_cleanup.append((reaction, user.mention, reason_text))
-                        user_ids[user.mention] = user.id
+                        reactions_for_cleanup.append((reaction, member.mention, reason_text))
+                        user_ids[member.mention] = member.id
         return reactions_for_cleanup, user_ids
 
     class RASession(commands.Cog):
@@ -912,7 +1665,7 @@ class Reactions(commands.Cog):
         async def save_config_changes(self):
             message_link = self.config[KEY_MESSAGE_LINK]
             message = await fetch_message(self.ctx, message_link)
-            existing_config = await self.parent.get_config_for_message(message)
+            existing_config = self.parent.get_config_for_message(message)
 
             if list(existing_config.values()) == list(self.config.values()):
                 embed = create_basic_embed('Config session ended. You didn\'t make any changes!', '🤨')
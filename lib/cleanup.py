@@ -0,0 +1,72 @@
+from asyncio import gather
+from datetime import timedelta
+from discord import HTTPException, Object
+from lib.utils import log
+from time import monotonic
+
+CLEANUP_JOB_RUNNING = 'running'
+CLEANUP_JOB_COMPLETED = 'completed'
+CLEANUP_JOB_CANCELLED = 'canceled'
+CLEANUP_JOB_FAILED = 'failed'
+
+
+class CleanupJob:
+    """ A persisted removal of reactions from a single message, which can be resumed from its last checkpoint.
+
+    "removals" is a list of (emoji, user_id) pairs, and "progress" is the number of them that have been processed (and
+    checkpointed) so far. The throughput and ETA only consider the current run, so they stay accurate after a restart.
+    """
+
+    def __init__(self, job_id, server_id, channel_id, preview_message_id, target_channel_id, target_message_id,
+                 removals, progress=0, removed_count=0, status=CLEANUP_JOB_RUNNING):
+        self.job_id = job_id
+        self.server_id = server_id
+        self.channel_id = channel_id
+        self.preview_message_id = preview_message_id
+        self.target_channel_id = target_channel_id
+        self.target_message_id = target_message_id
+        self.removals = removals
+        self.progress = progress
+        self.removed_count = removed_count
+        self.status = status
+        self.run_started_at = monotonic()
+        self.run_start_progress = progress
+
+    def get_rate(self):
+        """ Returns the number of removals processed per second since the job was (re)started. """
+        elapsed_seconds = monotonic() - self.run_started_at
+        return ((self.progress - self.run_start_progress) / elapsed_seconds) if elapsed_seconds else 0
+
+    def get_progress_text(self):
+        progress_text = f'**{self.progress}** of **{len(self.removals)}**'
+        rate = self.get_rate()
+        if (self.status == CLEANUP_JOB_RUNNING) and rate:
+            eta = timedelta(seconds=round((len(self.removals) - self.progress) / rate))
+            progress_text += f' \u200B ({rate:.1f}/s, about {eta} left)'
+        return progress_text
+
+
+async def remove_reactions(removals):
+    """ Removes each (message, emoji, user_id) in the given list, and returns the ones that were removed successfully.
+
+    Discord rate-limits reaction removals per channel, so the removals are split into one queue per channel. Each queue
+    is worked through one request at a time (so that it never gets ahead of its rate limit), but the queues for
+    different channels are worked through in parallel. The messages may be partial, since nothing is fetched.
+    """
+    queues = {}
+    for message, emoji, user_id in removals:
+        queues.setdefault(message.channel.id, []).append((message, emoji, user_id))
+
+    async def work_through_queue(queue):
+        removed = []
+        for message, emoji, user_id in queue:
+            try:
+                await message.remove_reaction(emoji, Object(id=user_id))  # The user doesn't need to be fetched.
+                removed.append((message, emoji, user_id))
+            except HTTPException as error:
+                log(f'CLEANUP: Failed to remove user {user_id}\'s "{emoji}" reaction from message {message.id}: '
+                    f'{error}')
+        return removed
+
+    return [removal for removed in await gather(*(work_through_queue(queue) for queue in queues.values()))
+            for removal in removed]
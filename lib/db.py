@@ -0,0 +1,95 @@
+from aiosqlite import connect
+from asyncio import Lock
+from contextlib import asynccontextmanager
+
+# One shared Database object per database file, keyed by path.
+databases = {}
+
+
+class Database:
+    """ A long-lived, shared connection to a single SQLite database file.
+
+    The connection is opened lazily on first use and then kept open for the lifetime of the bot, so queries never pay
+    for opening the file, and sqlite3's per-connection statement cache means repeated queries are only prepared once.
+    The database is switched to WAL mode so that reads are never blocked by a write that's in progress.
+
+    All queries run on aiosqlite's worker thread, so none of them block the event loop. Writes are serialized through
+    a lock, which guarantees that one coroutine's commit can never include another coroutine's half-finished changes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = None
+        self.connection_lock = Lock()
+        self.write_lock = Lock()
+
+    async def get_connection(self):
+        async with self.connection_lock:
+            if not self.connection:
+                connection = connect(self.path)
+                connection.daemon = True  # The connection's thread must not keep the process alive after shutdown.
+                self.connection = await connection
+                await self.connection.execute('PRAGMA journal_mode=WAL')
+                await self.connection.execute('PRAGMA synchronous=NORMAL')
+        return self.connection
+
+    async def fetchone(self, query: str, parameters: tuple = ()):
+        connection = await self.get_connection()
+        async with connection.execute(query, parameters) as cursor:
+            return await cursor.fetchone()
+
+    async def fetchall(self, query: str, parameters: tuple = ()):
+        connection = await self.get_connection()
+        async with connection.execute(query, parameters) as cursor:
+            return await cursor.fetchall()
+
+    async def execute(self, query: str, parameters: tuple = ()) -> int:
+        """ Runs a single write statement in its own transaction and returns the number of affected rows. """
+        async with self.transaction() as connection:
+            async with connection.execute(query, parameters) as cursor:
+                return cursor.rowcount
+
+    async def executemany(self, query: str, parameters_list: list) -> int:
+        async with self.transaction() as connection:
+            async with connection.executemany(query, parameters_list) as cursor:
+                return cursor.rowcount
+
+    @asynccontextmanager
+    async def transaction(self):
+        """ Yields the connection for a group of writes that are committed together (or rolled back on error). """
+        connection = await self.get_connection()
+        async with self.write_lock:
+            try:
+                yield connection
+            except BaseException:
+                await connection.rollback()
+                raise
+            else:
+                await connection.commit()
+
+    async def migrate(self, migrations: list):
+        """ Brings the schema up to date by running every migration that hasn't been run on this database yet, in order.
+
+        The schema version is kept in SQLite's user_version pragma, and migrations[i] is an async function that takes
+        the connection and upgrades the schema from version i to version i + 1. Each migration runs in one transaction
+        together with its version bump, so a migration that fails leaves the database exactly as it was before.
+        """
+        (version,) = await self.fetchone('PRAGMA user_version')
+        for new_version, migration in enumerate(migrations[version:], version + 1):
+            async with self.transaction() as connection:
+                await connection.execute('BEGIN')  # Otherwise, sqlite3 would run the schema changes outside of it.
+                await migration(connection)
+                await connection.execute(f'PRAGMA user_version={new_version}')
+
+    async def close(self):
+        async with self.connection_lock:
+            if self.connection:
+                await self.connection.close()
+                self.connection = None
+
+
+def get_database(path: str) -> Database:
+    if path not in databases:
+        databases[path] = Database(path)
+    return databases[path]
+
@@ -0,0 +1,83 @@
+from asyncio import get_event_loop, sleep
+from discord import Forbidden, HTTPException
+from lib.embeds import create_basic_embed
+from lib.metrics import increment_counter, set_gauge
+from lib.utils import log
+from time import monotonic
+
+DM_INTERVAL_SECONDS = 0.5  # The minimum amount of time between two DMs, so that a burst of them is spread out.
+CLOSED_DMS_RETRY_SECONDS = 6 * 60 * 60  # How long to skip a user after their DMs turned out to be closed.
+
+METRIC_QUEUE_DEPTH = 'dm.queue_depth'
+METRIC_COALESCED = 'dm.coalesced'
+METRIC_SKIPPED_CLOSED = 'dm.skipped_closed'
+
+
+class PendingDM:
+    def __init__(self, user):
+        self.user = user
+        self.content_parts = []
+        self.embed_lines = []
+
+
+# The DMs waiting to be sent, keyed by user ID, in the order they were queued.
+pending_dms = {}
+
+# Maps the IDs of users who don't accept DMs from the bot to the time after which they should be tried again.
+closed_dm_user_ids = {}
+
+dispatch_task = None
+
+
+def queue_dm(user, content: str = None, embed_text: str = None):
+    """ Queues a DM to the user, which is sent in the background. Returns False if the user's DMs are closed.
+
+    If something is queued for a user who already has a DM waiting to be sent, it's merged into that DM instead, so
+    a user never gets several DMs in a row for a burst of activity. Embed texts are merged line by line into one embed.
+    """
+    retry_time = closed_dm_user_ids.get(user.id)
+    if retry_time:
+        if monotonic() < retry_time:
+            increment_counter(METRIC_SKIPPED_CLOSED)
+            return False
+        del closed_dm_user_ids[user.id]
+
+    pending_dm = pending_dms.get(user.id)
+    if pending_dm:
+        increment_counter(METRIC_COALESCED)
+    else:
+        pending_dm = PendingDM(user)
+        pending_dms[user.id] = pending_dm
+    if content:
+        pending_dm.content_parts.append(content)
+    if embed_text:
+        pending_dm.embed_lines.append(embed_text)
+
+    set_gauge(METRIC_QUEUE_DEPTH, len(pending_dms))
+    schedule_dispatch()
+    return True
+
+
+def schedule_dispatch():
+    global dispatch_task
+    if not dispatch_task or dispatch_task.done():
+        dispatch_task = get_event_loop().create_task(dispatch_dms())
+
+
+async def dispatch_dms():
+    while pending_dms:
+        user_id = next(iter(pending_dms))
+        pending_dm = pending_dms.pop(user_id)
+        set_gauge(METRIC_QUEUE_DEPTH, len(pending_dms))
+
+        user = pending_dm.user
+        content = '\n\n'.join(pending_dm.content_parts) or None
+        embed = create_basic_embed('\n'.join(pending_dm.embed_lines)) if pending_dm.embed_lines else None
+        try:
+            await user.send(content, embed=embed)
+        except Forbidden:
+            log(f'DM: {user.name}#{user.discriminator} doesn\'t accept DMs, so they\'ll be skipped for a while.')
+            closed_dm_user_ids[user_id] = monotonic() + CLOSED_DMS_RETRY_SECONDS
+        except HTTPException as error:
+            log(f'ERROR: Failed to send a DM to {user.name}#{user.discriminator}: {error}')
+        await sleep(DM_INTERVAL_SECONDS)
@@ -50,7 +50,7 @@ class Event:
 
     # Returns an Event if the json is valid, and an error message string otherwise.
     @staticmethod
-    def from_json(ctx, event_json):
+    async def from_json(ctx, event_json):
         event = Event.from_dict(loads(event_json))
 
         faction_str = event.faction.lower()
@@ -68,7 +68,7 @@ class Event:
         for role, player_list in event.players.items():
             user_id_list = []
             for player_name in player_list:
-                member = (ctx.bot.get_cog('Nicknames').get_member_by_nickname(ctx, player_name)
+                member = (await ctx.bot.get_cog('Nicknames').get_member_by_nickname(ctx, player_name)
                           or ctx.guild.get_member_named(player_name))
                 if member:
                     user_id_list.append(member.id)
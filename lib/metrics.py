@@ -0,0 +1,56 @@
+from dataclasses import dataclass
+
+# All metrics recorded by the bot since it started, keyed by name. Names are prefixed with the cog that records them.
+metrics = {}
+
+
+@dataclass
+class TimingMetric:
+    count: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def __str__(self):
+        average_ms = (self.total_seconds / self.count * 1000) if self.count else 0
+        return f'{self.count} × avg {average_ms:.1f} ms, max {self.max_seconds * 1000:.1f} ms'
+
+
+@dataclass
+class SummaryMetric:
+    count: int = 0
+    total: float = 0
+    max_value: float = 0
+
+    def record(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max_value = max(self.max_value, value)
+
+    def __str__(self):
+        average = (self.total / self.count) if self.count else 0
+        return f'{self.count} × avg {average:.1f}, max {self.max_value}'
+
+
+def record_timing(name: str, seconds: float):
+    if name not in metrics:
+        metrics[name] = TimingMetric()
+    metrics[name].record(seconds)
+
+
+def record_value(name: str, value: float):
+    if name not in metrics:
+        metrics[name] = SummaryMetric()
+    metrics[name].record(value)
+
+
+def increment_counter(name: str, amount: int = 1):
+    metrics[name] = metrics.get(name, 0) + amount
+
+
+def set_gauge(name: str, value):
+    metrics[name] = value
@@ -42,7 +42,7 @@ class Permission(Enum):
     # PROTECTS:  Commands related to displaying/managing/enforcing the permissions listed in this file (ooh, meta).
     # USED IN:   cogs/permissions.py
     VIEW_PERMISSIONS = 2, ['pm overview', 'pm details'], True
-    CHANGE_PERMISSIONS = 3, ['pm enable', 'pm disable', 'pm toggle'], True
+    CHANGE_PERMISSIONS = 3, ['pm enable', 'pm disable', 'pm toggle', 'pm bulk'], True
 
     # CATEGORY:  Prefix
     # PROTECTS:  Commands related to displaying/changing the prefix used by all CirqueBot commands.
@@ -1,14 +1,92 @@
 import json
-import os.path
+import os
+from asyncio import get_event_loop, sleep
+from lib.db import get_database
 
 DEFAULT_PREFIX = '!cb '
-PREFIXES_PATH = 'data/prefixes.json'
+PREFIXES_DB = 'data/prefixes.db'
+LEGACY_PREFIXES_PATH = 'data/prefixes.json'  # Imported into the database (and then renamed) the first time it's seen.
+FLUSH_DELAY_SECONDS = 2  # How long to collect prefix changes before writing them all to the database in one batch.
+
+# The in-memory prefix table, keyed by server ID. This is the only thing that get_prefix ever reads.
+prefixes = {}
+
+# Prefix changes that haven't been written to the database yet, keyed by server ID.
+pending_prefixes = {}
+flush_task = None
 
 
 def get_prefix(bot, message):
-    if not message.guild or not os.path.isfile(PREFIXES_PATH):
+    # This is called for every message the bot sees, so it must stay a pure in-memory lookup.
+    if not message.guild:
         return DEFAULT_PREFIX
-    with open(PREFIXES_PATH, 'r') as file:
-        prefixes = json.load(file)
-    server_id = str(message.guild.id)
-    return prefixes.get(server_id, DEFAULT_PREFIX)
+    return prefixes.get(message.guild.id, DEFAULT_PREFIX)
+
+
+async def load_prefixes():
+    database = get_database(PREFIXES_DB)
+    await database.execute(
+        '''CREATE TABLE IF NOT EXISTS `prefixes` (
+            `server_id` INTEGER PRIMARY KEY UNIQUE,
+            `prefix` TEXT NOT NULL
+        );''')
+
+    if os.path.isfile(LEGACY_PREFIXES_PATH):
+        with open(LEGACY_PREFIXES_PATH, 'r') as file:
+            legacy_prefixes = json.load(file)
+        await database.executemany(
+            'INSERT OR IGNORE INTO prefixes VALUES (?, ?)',
+            [(int(server_id), prefix) for server_id, prefix in legacy_prefixes.items()])
+        os.replace(LEGACY_PREFIXES_PATH, LEGACY_PREFIXES_PATH + '.imported')
+
+    loaded_prefixes = dict(await database.fetchall('SELECT server_id, prefix FROM prefixes'))
+
+    # Changes made while the table was loading are newer than anything in the database, so they take precedence.
+    loaded_prefixes.update(pending_prefixes)
+    prefixes.clear()
+    prefixes.update({server_id: prefix for server_id, prefix in loaded_prefixes.items() if prefix != DEFAULT_PREFIX})
+
+
+def update_prefix(server_id, new_prefix):
+    """ Updates the in-memory prefix table immediately and schedules the change to be written to the database. """
+    if new_prefix == DEFAULT_PREFIX:
+        prefixes.pop(server_id, None)
+    else:
+        prefixes[server_id] = new_prefix
+
+    pending_prefixes[server_id] = new_prefix
+    schedule_flush()
+
+
+def schedule_flush():
+    global flush_task
+    if not flush_task or flush_task.done():
+        flush_task = get_event_loop().create_task(flush_prefixes(FLUSH_DELAY_SECONDS))
+
+
+async def flush_prefixes(delay_seconds=0):
+    await sleep(delay_seconds)
+
+    # Changes made while a batch is being written can't schedule a flush of their own (because this one is still
+    # running), so keep writing batches until there's nothing left.
+    while pending_prefixes:
+        batch = pending_prefixes.copy()
+        pending_prefixes.clear()
+        try:
+            # All changes in the batch are written in a single transaction, so a crash can never leave a partial write.
+            async with get_database(PREFIXES_DB).transaction() as connection:
+                await connection.executemany(
+                    'DELETE FROM prefixes WHERE server_id=?',
+                    [(server_id,) for server_id, prefix in batch.items() if prefix == DEFAULT_PREFIX])
+                await connection.executemany(
+                    'INSERT INTO prefixes (server_id, prefix) VALUES (?, ?) '
+                    'ON CONFLICT (server_id) DO UPDATE SET prefix=excluded.prefix',
+                    [(server_id, prefix) for server_id, prefix in batch.items() if prefix != DEFAULT_PREFIX])
+        except Exception as error:
+            from lib.utils import log  # Imported here because lib.utils (indirectly) depends on this module.
+            # Put the batch back (without overwriting anything newer) so that it's retried by the next flush.
+            for server_id, prefix in batch.items():
+                pending_prefixes.setdefault(server_id, prefix)
+            log(f'ERROR: Failed to save {len(batch)} prefix change(s), will retry: {error}')
+            get_event_loop().call_soon(schedule_flush)
+            return
@@ -0,0 +1,75 @@
+import asyncio
+from heapq import heappop, heappush
+from itertools import count
+from lib.utils import log
+from time import monotonic
+
+
+class Scheduler:
+    """ Runs coroutine functions after a delay, using a heap of deadlines and a single task that waits for all of them.
+
+    However many callbacks are scheduled, only that one task is ever waiting: it sleeps until the earliest deadline,
+    and is woken up early whenever something with an even earlier deadline is scheduled. Each callback is identified
+    by a key, which can be used to cancel it. Cancelled callbacks are only removed from the heap once they come due.
+    Every callback is started as its own task when it's due, so a slow callback never holds up the others. Those tasks
+    are kept until they finish (so they can't be garbage collected mid-run), and their errors are logged.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.heap = []  # Holds a (deadline, sequence_number, key) tuple for every scheduled (or cancelled) callback.
+        self.entries = {}  # Maps the key of every scheduled callback to its (heap_entry, callback, args).
+        self.sequence = count()  # Breaks ties between equal deadlines, so that keys never have to be compared.
+        self.wake_event = asyncio.Event()
+        self.task = None
+        self.callback_tasks = set()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def schedule(self, key, delay_seconds: float, callback, *args):
+        """ Schedules callback(*args) to be run after the delay. Scheduling an existing key again replaces it. """
+        heap_entry = (monotonic() + delay_seconds, next(self.sequence), key)
+        self.entries[key] = (heap_entry, callback, args)
+        heappush(self.heap, heap_entry)
+
+        if not self.task or self.task.done():
+            self.task = self.loop.create_task(self.run())
+        elif self.heap[0] is heap_entry:
+            self.wake_event.set()  # The task is waiting for a later deadline, so it needs to start over.
+
+    def cancel(self, key) -> bool:
+        return self.entries.pop(key, None) is not None
+
+    async def run(self):
+        while self.entries:
+            # Skip over the heap entries of callbacks that have since been cancelled or rescheduled.
+            while self.heap and self.entries.get(self.heap[0][2], (None,))[0] is not self.heap[0]:
+                heappop(self.heap)
+
+            (deadline, unused_sequence_number, key) = self.heap[0]
+            delay_seconds = deadline - monotonic()
+            if delay_seconds > 0:
+                self.wake_event.clear()
+                try:
+                    await asyncio.wait_for(self.wake_event.wait(), delay_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heappop(self.heap)
+            (unused_heap_entry, callback, args) = self.entries.pop(key)
+            callback_task = self.loop.create_task(self.run_callback(key, callback, args))
+            self.callback_tasks.add(callback_task)
+            callback_task.add_done_callback(self.callback_tasks.discard)
+        self.heap.clear()
+
+    @staticmethod
+    async def run_callback(key, callback, args):
+        try:
+            await callback(*args)
+        except Exception as error:
+            log(f'ERROR: Scheduled callback {key} failed: {error}')
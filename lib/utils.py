@@ -2,6 +2,7 @@ import asyncio
 import numbers
 from datetime import datetime
 from json import loads
+from time import monotonic
 
 import aiohttp
 from discord import NotFound, Forbidden
@@ -16,6 +17,33 @@ def log(text, indent=0):
     print(f'{timestamp}  |  {"    " * indent}{text}')
 
 
+async def gather_with_concurrency(limit, coroutines):
+    """ Like asyncio.gather, but never runs more than "limit" of the given coroutines at the same time. """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run_with_semaphore(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(run_with_semaphore(coroutine) for coroutine in coroutines))
+
+
+class RateLimiter:
+    """ Spaces out the callers of acquire() so that, together, they never go faster than "rate" calls per second. """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate
+        self.next_time = 0
+
+    async def acquire(self):
+        # Each caller reserves its time slot before it starts waiting, so concurrent callers never share a slot.
+        now = monotonic()
+        wait_seconds = self.next_time - now
+        self.next_time = max(now, self.next_time) + self.interval
+        if wait_seconds > 0:
+            await asyncio.sleep(wait_seconds)
+
+
 def extract_channel_id(message_link):
     return int(message_link.split('/')[-2])
 
@@ -24,6 +52,11 @@ def extract_message_id(message_link):
     return int(message_link.split('/')[-1])
 
 
+def get_message_link(server_id, channel_id, message_id):
+    # This matches the format of Message.jump_url, but doesn't require the message to be fetched.
+    return f'https://discord.com/channels/{server_id}/{channel_id}/{message_id}'
+
+
 def get_message_link_string(message_link):
     return f'[{extract_message_id(message_link)}]({message_link})'
 
@@ -0,0 +1,48 @@
+import asyncio
+from collections import deque
+from lib.utils import log
+
+
+class WorkQueue:
+    """ A bounded queue of work items, which are handled in order by a fixed number of worker tasks.
+
+    Items that arrive while the queue is full are never dropped. Instead, they're deferred to an overflow list, and
+    moved into the queue (still in order) as soon as there's room for them. A semaphore can be shared between several
+    queues to cap the number of items that are being handled at the same time across all of them.
+    """
+
+    def __init__(self, loop, handler, worker_count: int, max_size: int, semaphore: asyncio.Semaphore = None):
+        self.handler = handler  # This is awaited with the contents of each item (which must be a tuple) as arguments.
+        self.queue = asyncio.Queue(maxsize=max_size)
+        self.deferred = deque()
+        self.semaphore = semaphore
+        self.workers = [loop.create_task(self.work()) for _ in range(worker_count)]
+
+    def __len__(self):
+        return self.queue.qsize() + len(self.deferred)
+
+    def put(self, item: tuple) -> bool:
+        """ Adds the item to the queue, and returns False if it had to be deferred because the queue is full. """
+        if self.deferred or self.queue.full():
+            self.deferred.append(item)
+            return False
+        self.queue.put_nowait(item)
+        return True
+
+    async def work(self):
+        while True:
+            item = await self.queue.get()
+            if self.deferred:
+                self.queue.put_nowait(self.deferred.popleft())
+            try:
+                if self.semaphore:
+                    async with self.semaphore:
+                        await self.handler(*item)
+                else:
+                    await self.handler(*item)
+            except Exception as error:
+                log(f'ERROR: Failed to handle queued work {item}: {error}')
+
+    def close(self):
+        for worker in self.workers:
+            worker.cancel()
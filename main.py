@@ -1,6 +1,6 @@
 from discord import Game, Intents
 from discord.ext import commands
-from lib.prefixes import get_prefix, DEFAULT_PREFIX
+from lib.prefixes import get_prefix, flush_prefixes, DEFAULT_PREFIX
 from secrets import BOT_TOKEN_DEV, BOT_TOKEN_LITE, BOT_TOKEN_PROD
 from sys import argv
 
@@ -10,16 +10,25 @@ CONFIG_LITE = 'LITE'
 CONFIG_PROD = 'PROD'
 CONFIG_DEV = 'DEV'
 
+
+class CirqueBot(commands.Bot):
+    async def close(self):
+        # Prefix changes are written to the database in batches, so make sure the last batch isn't lost on shutdown.
+        await flush_prefixes()
+        await super().close()
+
+
 intents = Intents.default()
 intents.members = True
 intents.guild_typing = True
 
-bot = commands.Bot(command_prefix=get_prefix, help_command=None, intents=intents)
+bot = CirqueBot(command_prefix=get_prefix, help_command=None, intents=intents)
 
 
 def initialize_bot(config):
     # Extensions that should be loaded for all bot configurations.
     bot.load_extension('cogs.help')
+    bot.load_extension('cogs.metrics')
     bot.load_extension('cogs.prefix')
     bot.load_extension('cogs.reactions')
 
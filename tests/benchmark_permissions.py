@@ -0,0 +1,87 @@
+""" Compares the memory used by the per-server permission representations, for 10k synthetic servers.
+
+    - "old" is a dict of PermissionConfig (with a frozenset whitelist) for every permission, which is what the cache
+      used to hold for a server once all of its permissions had been looked up (e.g. by "pm overview").
+    - "old (configured only)" is the same, but only for the permissions that differ from their defaults.
+    - "new" is a ServerPermissions snapshot (a bitmask plus sorted whitelist tuples).
+
+The channel IDs themselves are shared by all representations, so only the structures around them are measured.
+Run with: python -m tests.benchmark_permissions
+"""
+import random
+import tracemalloc
+from cogs.permissions import DEFAULT_SERVER_PERMISSIONS, PERMISSION_CONFIG_DISABLED, PERMISSION_CONFIG_ENABLED, \
+    PermissionConfig
+from lib.permission import Permission
+
+SERVER_COUNT = 10000
+MAX_CONFIGURED_PERMISSIONS = 8
+MAX_WHITELISTED_CHANNELS = 5
+
+
+def generate_servers(seed=0):
+    generator = random.Random(seed)
+    servers = []
+    for _ in range(SERVER_COUNT):
+        settings = {}
+        for permission in generator.sample(list(Permission), generator.randint(0, MAX_CONFIGURED_PERMISSIONS)):
+            kind = generator.random()
+            if kind < 0.3 and not permission.is_core_function:
+                settings[permission] = (False, ())
+            elif kind < 0.6:
+                settings[permission] = (True, ())
+            else:
+                channel_count = generator.randint(1, MAX_WHITELISTED_CHANNELS)
+                settings[permission] = (True, [generator.getrandbits(60) for _ in range(channel_count)])
+        servers.append(settings)
+    return servers
+
+
+def build_old(servers, configured_only=False):
+    cache = {}
+    for server_id, settings in enumerate(servers):
+        server_permissions = {}
+        for permission in Permission:
+            if permission in settings:
+                (is_enabled, channel_ids) = settings[permission]
+                server_permissions[permission.id] = PermissionConfig.get_config(is_enabled, frozenset(channel_ids))
+            elif not configured_only:
+                server_permissions[permission.id] = PermissionConfig.get_default_config_for_permission(permission)
+        cache[server_id] = server_permissions
+    return cache
+
+
+def build_new(servers):
+    cache = {}
+    for server_id, settings in enumerate(servers):
+        server_permissions = DEFAULT_SERVER_PERMISSIONS
+        for permission, (is_enabled, channel_ids) in settings.items():
+            permission_config = PermissionConfig.get_config(is_enabled, frozenset(channel_ids)) if channel_ids else \
+                (PERMISSION_CONFIG_ENABLED if is_enabled else PERMISSION_CONFIG_DISABLED)
+            server_permissions = server_permissions.with_config(permission, permission_config)
+        cache[server_id] = server_permissions
+    return cache
+
+
+def measure(build, *args):
+    tracemalloc.start()
+    cache = build(*args)
+    (size, unused_peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del cache
+    return size
+
+
+def main():
+    servers = generate_servers()
+    results = [
+        ('old', measure(build_old, servers)),
+        ('old (configured only)', measure(build_old, servers, True)),
+        ('new', measure(build_new, servers)),
+    ]
+    for name, size in results:
+        print(f'{name:>22}: {size / 1024:8.0f} KiB ({size / SERVER_COUNT:5.0f} bytes per server)')
+
+
+if __name__ == '__main__':
+    main()
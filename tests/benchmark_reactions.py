@@ -0,0 +1,111 @@
+""" Compares loading 10k reaction/role menus from the old JSON column and from the reaction_roles child table.
+
+    - "json column" is the schema before the menus were split out: every row of the reactions table carries its whole
+      menu as a JSON string in reaction_role_menu, which has to be parsed for every message on startup.
+    - "reaction_roles table" is the current schema (built from the same data by the real migrations): each
+      reaction/role pairing is its own row in a WITHOUT ROWID table, and the menus are read back with one query.
+
+Both are loaded into the same in-memory configs that the cog keeps (with Reactions.cache_config), and the time and the
+memory allocated by the load are reported for each. The time is measured in a separate run from the memory, since
+tracemalloc slows everything down.
+Run with: python -m tests.benchmark_reactions
+"""
+import asyncio
+import json
+import os
+import random
+import tracemalloc
+from cogs.reactions import REACTIONS_DB_MIGRATIONS, Reactions
+from lib.db import Database
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from types import SimpleNamespace
+
+MESSAGE_COUNT = 10000
+SERVER_COUNT = 200
+MAX_MENU_SIZE = 10
+EMOJI = ['👍', '👎', '🎉', '❤️', '🔥', '👀', '✅', '❌', '⭐', '🎮', '🎵', '📚']
+
+
+def generate_rows(seed=0):
+    generator = random.Random(seed)
+    rows = []
+    for message_id in range(1, MESSAGE_COUNT + 1):
+        menu = [[emoji, f'<@&{generator.getrandbits(60)}>']
+                for emoji in generator.sample(EMOJI, generator.randint(1, MAX_MENU_SIZE))]
+        rows.append((message_id, generator.getrandbits(60), generator.randrange(SERVER_COUNT), True,
+                     generator.random() < 0.5, generator.random() < 0.5, 0, None, json.dumps(menu)))
+    return rows
+
+
+async def create_databases(directory):
+    """ Creates a database with the old schema, and a copy of it that the real migrations have brought up to date. """
+    old_path = os.path.join(directory, 'old.db')
+    new_path = os.path.join(directory, 'new.db')
+    rows = generate_rows()
+
+    for path in (old_path, new_path):
+        database = Database(path)
+        await database.migrate(REACTIONS_DB_MIGRATIONS[:1])
+        await database.executemany('INSERT INTO reactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        if path == new_path:
+            await database.migrate(REACTIONS_DB_MIGRATIONS)
+        await database.close()
+
+    return old_path, new_path
+
+
+async def load_from_json_column(database):
+    cog = SimpleNamespace(configs={}, tracked_messages={})
+    for row in await database.fetchall('SELECT * FROM reactions ORDER BY message_id'):
+        Reactions.cache_config(cog, row[0], row[1], row[2], Reactions.get_config_from_row(row, json.loads(row[8])))
+    return cog
+
+
+async def load_from_reaction_roles_table(database):
+    # This is the same as Reactions.initialize_database.
+    cog = SimpleNamespace(configs={}, tracked_messages={})
+    menus = {}
+    for message_id, emoji, role_id in await database.fetchall(
+            'SELECT message_id, emoji, role_id FROM reaction_roles ORDER BY message_id, position'):
+        menus.setdefault(message_id, []).append([emoji, Reactions.get_role_str_from_role_id(role_id)])
+    for row in await database.fetchall('SELECT * FROM reactions ORDER BY message_id'):
+        Reactions.cache_config(cog, row[0], row[1], row[2], Reactions.get_config_from_row(row, menus.get(row[0], [])))
+    return cog
+
+
+async def measure(load, path):
+    database = Database(path)
+    await database.get_connection()  # Opening the connection isn't part of loading the configs.
+
+    started_at = perf_counter()
+    cog = await load(database)
+    seconds = perf_counter() - started_at
+    assert len(cog.tracked_messages) == MESSAGE_COUNT
+    del cog
+
+    tracemalloc.start()
+    cog = await load(database)
+    (size, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del cog
+
+    await database.close()
+    return seconds, size, peak
+
+
+async def main():
+    with TemporaryDirectory() as directory:
+        old_path, new_path = await create_databases(directory)
+        results = [
+            ('json column', await measure(load_from_json_column, old_path)),
+            ('reaction_roles table', await measure(load_from_reaction_roles_table, new_path)),
+        ]
+
+    for name, (seconds, size, peak) in results:
+        print(f'{name:>20}: {seconds * 1000:7.0f} ms, {size / 1024:7.0f} KiB kept, {peak / 1024:7.0f} KiB peak '
+              f'(for {MESSAGE_COUNT} messages)')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
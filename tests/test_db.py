@@ -0,0 +1,38 @@
+import asyncio
+from lib.db import Database
+
+# Counts up to a large number one row at a time, which keeps SQLite busy for a noticeable amount of time.
+SLOW_QUERY = 'WITH RECURSIVE counter(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM counter WHERE x < 3000000) ' \
+             'SELECT COUNT(*) FROM counter'
+TICK_SECONDS = 0.01
+
+
+def test_slow_query_does_not_block_event_loop(tmp_path):
+    async def run():
+        database = Database(str(tmp_path / 'test.db'))
+        await database.get_connection()  # Open the connection first, so that only the query itself is measured.
+
+        ticks = 0
+        query_done = asyncio.Event()
+
+        async def tick():
+            nonlocal ticks
+            while not query_done.is_set():
+                await asyncio.sleep(TICK_SECONDS)
+                ticks += 1
+
+        ticker = asyncio.get_running_loop().create_task(tick())
+        loop_time = asyncio.get_running_loop().time()
+        (row_count,) = await database.fetchone(SLOW_QUERY)
+        query_seconds = asyncio.get_running_loop().time() - loop_time
+        query_done.set()
+        await ticker
+        await database.close()
+        return row_count, ticks, query_seconds
+
+    row_count, ticks, query_seconds = asyncio.run(run())
+    assert row_count == 3000000
+
+    # If the query blocked the event loop, the ticker couldn't have run until it was finished.
+    assert query_seconds > 10 * TICK_SECONDS
+    assert ticks >= (query_seconds / TICK_SECONDS) / 4
@@ -0,0 +1,77 @@
+import asyncio
+import cogs.permissions
+import pytest
+from cogs.permissions import PERMISSIONS_BY_ID, Permissions, PermissionDenied
+from discord.ext.commands import Bot, Cog, CommandError, Context
+from discord.ext.commands.view import StringView
+from io import StringIO
+from types import SimpleNamespace
+
+PREFIX = '!cb '
+LINE_CHANGES = 'enable ALLOW_BONKS ALLOW_SPANKS\ntoggle CHANGE_GREETINGS <#1234>'
+JSON_CHANGES = '{"ALLOW_BONKS": true, "START_AUDIO": ["<#1234>", 5678]}'
+CODE_BLOCK_CHANGES = f'```json\n{JSON_CHANGES}\n```'
+
+
+async def invoke_bulk(content: str) -> str:
+    """ Runs the message through discord.py's command parsing, and returns the changes text that reached the cog. """
+    bot = Bot(command_prefix=PREFIX, help_command=None, loop=asyncio.get_running_loop())
+    cog = Permissions(bot)
+    bot.add_cog(cog)
+
+    received_changes = []
+
+    async def bulk_update_permissions(unused_ctx, changes_text):
+        received_changes.append(changes_text)
+
+    cog.bulk_update_permissions = bulk_update_permissions
+
+    message = SimpleNamespace(content=content, guild=None, channel=None, author=None, _state=None)
+    view = StringView(content)
+    ctx = Context(prefix=PREFIX, view=view, bot=bot, message=message)
+    view.skip_string(PREFIX)
+    ctx.invoked_with = view.get_word()
+    ctx.command = bot.all_commands[ctx.invoked_with]
+    await ctx.command.invoke(ctx)
+    return received_changes[0]
+
+
+async def initialize_database(unused_self):
+    pass  # Nothing in these tests reaches the database, so there's no need to create it.
+
+
+class HandlingCog(Cog):
+    async def cog_command_error(self, ctx, error):
+        pass
+
+
+async def report_command_error(cog_with_error, error: CommandError):
+    """ Passes the error to the listener, as if a command in the given cog (or outside of any cog) had raised it. """
+    bot = Bot(command_prefix=PREFIX, help_command=None, loop=asyncio.get_running_loop())
+    cog = Permissions(bot)
+    ctx = SimpleNamespace(command=SimpleNamespace(has_error_handler=lambda: False), cog=cog_with_error)
+    await cog.on_command_error(ctx, error)
+
+
+@pytest.mark.parametrize('changes', [LINE_CHANGES, JSON_CHANGES, CODE_BLOCK_CHANGES])
+def test_bulk_receives_raw_changes(monkeypatch, changes):
+    async def check(*unused_args):
+        return True
+
+    monkeypatch.setattr(Permissions, 'initialize_database', initialize_database)
+    monkeypatch.setattr(Permissions, 'check', staticmethod(check))
+    received_changes = asyncio.run(invoke_bulk(f'{PREFIX}pm bulk {changes}'))
+    assert received_changes == changes
+
+
+@pytest.mark.parametrize('cog_with_error, error, is_printed', [
+    (None, CommandError('unhandled'), True),
+    (None, PermissionDenied(next(iter(PERMISSIONS_BY_ID.values()))), False),
+    (HandlingCog(), CommandError('handled by the cog'), False),
+])
+def test_command_errors_are_printed_only_when_unhandled(monkeypatch, cog_with_error, error, is_printed):
+    printed_errors = StringIO()
+    monkeypatch.setattr(cogs.permissions, 'stderr', printed_errors)
+    monkeypatch.setattr(Permissions, 'initialize_database', initialize_database)
+    asyncio.run(report_command_error(cog_with_error, error))
+    assert bool(printed_errors.getvalue()) == is_printed